@@ -1,9 +1,33 @@
 # HostelBookingApp/app.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, make_response, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
 import os
+import base64
+import bisect
+import csv
+import functools
+import hashlib
+import heapq
+import io
+import json
+import math
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
 import datetime # Import datetime for timestamp
 
 # --- 1. Initialize Flask App ---
@@ -13,10 +37,94 @@ CORS(app) # Enable CORS for all routes, allowing your frontend to connect
 # --- 2. Database Configuration ---
 # Use SQLite for simplicity (file-based database)
 # The database file 'bookings.db' will be created in your project directory
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bookings.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bookings.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Suppress a warning
+# Connection pool for the writer; `timeout` makes concurrent bookings queue on SQLite's
+# write lock instead of failing fast
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': 30,
+    'connect_args': {'timeout': 30},
+}
+# SQLite tuning; SQLITE_TUNING=0 keeps SQLite's defaults and a single pool
+app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',   # Readers stop blocking behind the writer, and vice versa
+    'synchronous': 'NORMAL', # Durable with WAL; fsync at checkpoints rather than every commit
+    'busy_timeout': 30000,   # ms to wait for the write lock
+    'mmap_size': 268435456,  # Read up to 256 MB of the file through the OS page cache
+    'cache_size': -16000,    # ~16 MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+if app.config['SQLITE_TUNING']:
+    # Views marked @read_only get their own, larger pool of query_only connections
+    app.config['SQLALCHEMY_BINDS'] = {'read': {
+        **app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+        'url': app.config['SQLALCHEMY_DATABASE_URI'],
+        'pool_size': int(os.environ.get('DB_READ_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_READ_MAX_OVERFLOW', 20)),
+    }}
+# Rendered hostel responses: how many to keep and for how many seconds
+app.config['RESPONSE_CACHE_SIZE'] = 256
+app.config['RESPONSE_CACHE_TTL'] = 300
+# How long a booking's Idempotency-Key is remembered, in seconds
+app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+# Bed holds: default and longest lifetime, in seconds
+app.config['HOLD_TTL'] = int(os.environ.get('HOLD_TTL', 10 * 60))
+app.config['HOLD_MAX_TTL'] = int(os.environ.get('HOLD_MAX_TTL', 30 * 60))
+# Outgoing mail for booking notifications (leave SMTP_HOST empty to print them instead)
+app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', '')
+app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 25))
+app.config['SMTP_USER'] = os.environ.get('SMTP_USER', '')
+app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD', '')
+app.config['MAIL_FROM'] = os.environ.get('MAIL_FROM', 'bookings@hostelsbooking.local')
+# Statements slower than this are logged along with the view that ran them
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+# Admission control for booking writes: per-client token buckets (0 per minute turns them
+# off), optionally kept in a SQLite file shared by worker processes, and a cap on concurrent
+# write requests (0 for none) with how long a request may wait for a slot, in seconds
+app.config['RATE_LIMIT_PER_MINUTE'] = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 10))
+app.config['RATE_LIMIT_BURST'] = int(os.environ.get('RATE_LIMIT_BURST', 5))
+app.config['RATE_LIMIT_DB'] = os.environ.get('RATE_LIMIT_DB', '')
+app.config['WRITE_CONCURRENCY'] = int(os.environ.get('WRITE_CONCURRENCY', 8))
+app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 2))
 
-db = SQLAlchemy(app)
+class RoutingSession(FlaskSession):
+    """Session that sends queries from @read_only views to the 'read' engine.
+
+    Flushes always go to the writer, so a read-only view that does write still works.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and 'read' in self._db.engines and g.get('read_only'):
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+def _sqlite_pragmas(read_only):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in app.config['SQLITE_PRAGMAS'].items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+    return on_connect
+
+if app.config['SQLITE_TUNING']:
+    with app.app_context():
+        event.listen(db.engines[None], 'connect', _sqlite_pragmas(read_only=False))
+        event.listen(db.engines['read'], 'connect', _sqlite_pragmas(read_only=True))
+
+def read_only(view):
+    """Run a view's queries on the read pool, off the writer's connections."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
 
 # --- 3. Database Models ---
 # Define the structure of your database tables as Python classes
@@ -24,18 +132,35 @@ db = SQLAlchemy(app)
 # Model for Bookings
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    hostel_id = db.Column(db.Integer, nullable=False)
+    hostel_id = db.Column(db.Integer, db.ForeignKey('hostel.id'), nullable=False)
     hostel_name = db.Column(db.String(100), nullable=False)
-    checkin_date = db.Column(db.String(10), nullable=False) # Stored as YYYY-MM-DD string
+    checkin_date = db.Column(db.Date, nullable=False)
     num_beds = db.Column(db.Integer, nullable=False)
     user_name = db.Column(db.String(100), nullable=True)
     user_email = db.Column(db.String(100), nullable=True)
     user_phone = db.Column(db.String(20), nullable=True) # New field for user phone
-    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow) # Use utcnow for consistency
+    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True) # Use utcnow for consistency
+
+    __table_args__ = (
+        db.Index('ix_booking_hostel_checkin', 'hostel_id', 'checkin_date'), # Per-hostel date-range lookups
+    )
 
     def __repr__(self):
         return f'<Booking {self.hostel_name} on {self.checkin_date} for {self.num_beds} beds by {self.user_name}>'
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'hostel_id': self.hostel_id,
+            'hostel_name': self.hostel_name,
+            'checkin_date': self.checkin_date.isoformat(),
+            'num_beds': self.num_beds,
+            'user_name': self.user_name,
+            'user_email': self.user_email,
+            'user_phone': self.user_phone,
+            'timestamp': self.timestamp.isoformat() # Convert datetime object to ISO format string
+        }
+
 # Model for Hostels (to store hostel details, especially owner info)
 class Hostel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -46,101 +171,1444 @@ class Hostel(db.Model):
     owner_name = db.Column(db.String(100), nullable=False)
     owner_phone = db.Column(db.String(20), nullable=False)
     owner_email = db.Column(db.String(100), nullable=False)
+    total_beds = db.Column(db.Integer, nullable=False, default=50, server_default='50') # Beds available per night
 
     def __repr__(self):
         return f'<Hostel {self.name} by {self.owner_name}>'
 
-# --- 4. API Routes (Endpoints) ---
+# Model for per-night bed inventory (one row per hostel per check-in date)
+class BedInventory(db.Model):
+    hostel_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    capacity = db.Column(db.Integer, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<BedInventory hostel {self.hostel_id} on {self.date}: {self.booked}/{self.capacity}>'
+
+# Bookings and beds per hostel per check-in date, kept current by triggers on the booking table
+class OccupancyDaily(db.Model):
+    hostel_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    beds = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OccupancyDaily hostel {self.hostel_id} on {self.date}: {self.beds} beds>'
+
+# Beds set aside while a guest fills in the booking form; given back if not confirmed in time
+class BedHold(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), nullable=False, unique=True, default=lambda: uuid.uuid4().hex)
+    hostel_id = db.Column(db.Integer, db.ForeignKey('hostel.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    num_beds = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='held') # held, confirmed, released or expired
+    expires_at = db.Column(db.DateTime, nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    booking = db.relationship('Booking')
+
+    __table_args__ = (
+        db.Index('ix_bed_hold_due', 'status', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<BedHold {self.token}: {self.num_beds} beds at hostel {self.hostel_id} on {self.date}, {self.status}>'
+
+    def to_dict(self):
+        return {
+            'token': self.token,
+            'hostel_id': self.hostel_id,
+            'checkin_date': self.date.isoformat(),
+            'num_beds': self.num_beds,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat(),
+        }
+
+# Change feed for /api/stream, written by triggers on booking and bed_inventory
+class LiveEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True) # Doubles as the SSE event id
+    kind = db.Column(db.String(20), nullable=False) # availability or booking
+    hostel_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False) # JSON sent to clients as the event data
+    created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<LiveEvent {self.id} {self.kind} for hostel {self.hostel_id}>'
+
+# Bookings already made under a client's Idempotency-Key (or the booking form's hidden token)
+class IdempotencyKey(db.Model):
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False) # SHA-256 of the request that used the key
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} -> booking {self.booking_id}>'
+
+# Outbox of notifications to send; rows are written in the same transaction as the booking
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
+    recipient = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending') # pending, sending, sent or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    booking = db.relationship('Booking')
+
+    __table_args__ = (
+        db.Index('ix_notification_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<Notification {self.id} to {self.recipient}: {self.status}>'
+
+# A single row whose version triggers bump on every hostel write, from any process or raw SQL
+class CacheVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True) # Always 1
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.version}>'
+
+# --- 4. Bed Inventory ---
+
+def reserve_beds(hostel, checkin_date, num_beds):
+    """Take num_beds from hostel's inventory for checkin_date inside the current transaction.
+
+    The decrement is a single conditional UPDATE, so two writers can never both see the
+    same free beds: SQLite holds its write lock from this statement until commit.
+    Returns True if the beds were reserved, False if there is not enough room.
+    """
+    take = (
+        db.update(BedInventory)
+        .where(BedInventory.hostel_id == hostel.id,
+               BedInventory.date == checkin_date,
+               BedInventory.booked + num_beds <= BedInventory.capacity)
+        .values(booked=BedInventory.booked + num_beds)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(take).rowcount == 1:
+        return True
+    if db.session.get(BedInventory, (hostel.id, checkin_date)) is not None:
+        return False # Not enough room
+    # First booking for the night: create its inventory row from the hostel's capacity, counting
+    # the beds booked before the row existed (a database upgraded from before bed_inventory, or
+    # a raw load). This is the only place the booking table is summed, once per night.
+    db.session.execute(
+        sqlite_insert(BedInventory)
+        .values(hostel_id=hostel.id, date=checkin_date, capacity=hostel.total_beds,
+                booked=booked_beds(hostel.id, checkin_date).scalar_subquery())
+        .on_conflict_do_nothing()
+    )
+    return db.session.execute(take).rowcount == 1
+
+def beds_available(hostel, checkin_date):
+    inventory = db.session.get(BedInventory, (hostel.id, checkin_date))
+    if inventory:
+        return inventory.capacity - inventory.booked
+    return hostel.total_beds - db.session.scalar(booked_beds(hostel.id, checkin_date))
+
+def booked_beds(hostel_id, checkin_date):
+    """SELECT of the beds booked at hostel_id for checkin_date, counted from the booking table."""
+    return (db.select(db.func.coalesce(db.func.sum(Booking.num_beds), 0))
+            .where(Booking.hostel_id == hostel_id, Booking.checkin_date == checkin_date))
+
+BOOKING_COLUMNS = 'id, hostel_id, hostel_name, checkin_date, num_beds, user_name, user_email, user_phone, timestamp'
+
+def upgrade_schema():
+    """Bring a bookings.db created by an older version of the app up to date, in place.
+
+    Every step checks whether it is still needed, so this is safe to run on every start.
+    Raises RuntimeError, with nothing changed, if the existing rows cannot be carried over.
+    """
+    with db.engine.connect() as conn:
+        # One write transaction for the whole upgrade: either all of it lands or none of it
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+        hostel_columns = {row[1] for row in conn.exec_driver_sql('PRAGMA table_info(hostel)')}
+        if 'total_beds' not in hostel_columns:
+            conn.exec_driver_sql('ALTER TABLE hostel ADD COLUMN total_beds INTEGER NOT NULL DEFAULT 50')
+
+        # checkin_date used to be VARCHAR(10). SQLite cannot change a column's type, so the
+        # table is rebuilt with the current definition and the rows are copied across.
+        booking_columns = {row[1]: row[2] for row in conn.exec_driver_sql('PRAGMA table_info(booking)')}
+        orphans = []
+        if booking_columns.get('checkin_date', 'DATE').upper() != 'DATE':
+            # The old table had no foreign keys, so bookings may name a hostel that was since
+            # deleted. The new table cannot hold them; set them aside in orphaned_booking.
+            orphans = conn.exec_driver_sql(
+                'SELECT booking.id, booking.hostel_id FROM booking '
+                'LEFT JOIN hostel ON hostel.id = booking.hostel_id WHERE hostel.id IS NULL').all()
+            if orphans:
+                conn.exec_driver_sql('CREATE TABLE IF NOT EXISTS orphaned_booking AS SELECT * FROM booking WHERE 0')
+                conn.exec_driver_sql('INSERT INTO orphaned_booking SELECT booking.* FROM booking '
+                                     'LEFT JOIN hostel ON hostel.id = booking.hostel_id WHERE hostel.id IS NULL')
+                conn.exec_driver_sql('DELETE FROM booking WHERE hostel_id NOT IN (SELECT id FROM hostel)')
+            # A DATE column only reads back YYYY-MM-DD, so stop rather than copy anything else.
+            # date() also rolls impossible days over ('2026-02-30' -> '2026-03-02'); refuse those too.
+            unreadable = conn.exec_driver_sql(
+                'SELECT id, checkin_date FROM booking '
+                'WHERE date(checkin_date) IS NULL OR date(checkin_date) != substr(checkin_date, 1, 10)').all()
+            if unreadable:
+                raise RuntimeError(f"{len(unreadable)} booking(s) have a check-in date that is not YYYY-MM-DD; "
+                                   f"correct them and upgrade again: "
+                                   + ', '.join(f'#{id} {date!r}' for id, date in unreadable[:20]))
+            # SQLite's recipe for changing a table: build the new one under another name, then
+            # drop the old one and rename. Renaming the old table out of the way instead would
+            # repoint the foreign keys of notification, bed_hold, etc. at it before it is dropped.
+            for index in Booking.__table__.indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+            create_table = str(CreateTable(Booking.__table__).compile(conn))
+            conn.exec_driver_sql(create_table.replace('CREATE TABLE booking ', 'CREATE TABLE booking_new ', 1))
+            conn.exec_driver_sql(
+                f'INSERT INTO booking_new ({BOOKING_COLUMNS}) '
+                f'SELECT {BOOKING_COLUMNS.replace("checkin_date", "date(checkin_date)")} FROM booking')
+            conn.exec_driver_sql('DROP TABLE booking')
+            conn.exec_driver_sql('ALTER TABLE booking_new RENAME TO booking')
+            # The occupancy and live event triggers were dropped with the old table; recreate them and recount
+            for statement in OCCUPANCY_TRIGGERS + LIVE_EVENT_TRIGGERS + OCCUPANCY_REBUILD:
+                conn.exec_driver_sql(statement)
+            # Tables pointing at booking must still find their rows in the rebuilt table
+            broken = [row for table in db.metadata.sorted_tables
+                      if any(key.column.table is Booking.__table__ for key in table.foreign_keys)
+                      for row in conn.exec_driver_sql(f'PRAGMA foreign_key_check({table.name})') if row[2] == 'booking']
+            if broken:
+                raise RuntimeError(f"{len(broken)} row(s) would point at missing bookings after the rebuild, e.g. "
+                                   + ', '.join(f'{table} row {rowid}' for table, rowid, _, _ in broken[:20]))
+
+        for index in Booking.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        conn.commit()
+    if orphans:
+        app.logger.warning('Moved %d booking(s) for hostels that no longer exist to orphaned_booking: %s',
+                           len(orphans), ', '.join(f'#{id} (hostel {hostel_id})' for id, hostel_id in orphans[:20]))
+    db.session.execute(db.text('ANALYZE'))  # Refresh planner statistics for the new indexes
+    db.session.commit()
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Upgrade the bookings database schema in place."""
+    db.create_all()
+    try:
+        upgrade_schema()
+    except RuntimeError as e:
+        raise SystemExit(f"Upgrade aborted, nothing was changed: {e}")
+    print("Database schema is up to date.")
+
+# --- 5. Idempotency Keys ---
+# A retried or double-submitted booking carries the same key as the original. The key is
+# recorded in the same transaction as the booking it created, so the booking and its key
+# commit together or not at all, and a replay gets that booking back instead of a new one.
+
+def find_idempotent_booking(key, request_hash):
+    """Return the id of the booking already created under key, or None.
+
+    Raises ValueError if the key was used for a different request.
+    """
+    record = db.session.get(IdempotencyKey, key)
+    if record is None or record.expires_at < datetime.datetime.utcnow():
+        return None
+    if record.request_hash != request_hash:
+        raise ValueError("Idempotency key was already used for a different booking")
+    return record.booking_id
+
+def claim_idempotency_key(key, request_hash, booking_id):
+    """Record key as having created booking_id, inside the current transaction.
+
+    Only an expired record can be overwritten, so when two requests with the same key race,
+    the one that commits second gets False and should roll back and replay the first.
+    Also purges expired keys, which keeps the table bounded by IDEMPOTENCY_TTL.
+    """
+    now = datetime.datetime.utcnow()
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+    values = {'key': key, 'request_hash': request_hash, 'booking_id': booking_id,
+              'expires_at': now + datetime.timedelta(seconds=app.config['IDEMPOTENCY_TTL'])}
+    result = db.session.execute(sqlite_insert(IdempotencyKey).values(values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+# --- 6. Occupancy Rollups ---
+# occupancy_daily is a materialized count of bookings and beds per (hostel_id, date). SQLite
+# triggers adjust one row on every booking insert, update or delete, including bulk inserts
+# that bypass the ORM, so analytics read a few hundred rollup rows however long the booking
+# history grows. create_all() backfills it the first time; `flask rebuild-occupancy` redoes that.
+
+def _count_booking(row, sign):
+    return (f"INSERT INTO occupancy_daily (hostel_id, date, bookings, beds) "
+            f"VALUES ({row}.hostel_id, {row}.checkin_date, {sign}1, {sign}{row}.num_beds) "
+            f"ON CONFLICT (hostel_id, date) DO UPDATE SET bookings = bookings + excluded.bookings, beds = beds + excluded.beds; "
+            f"DELETE FROM occupancy_daily WHERE hostel_id = {row}.hostel_id AND date = {row}.checkin_date AND bookings = 0;")
+
+OCCUPANCY_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_insert AFTER INSERT ON booking BEGIN {_count_booking('new', '+')} END",
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_update AFTER UPDATE OF hostel_id, checkin_date, num_beds ON booking "
+    f"BEGIN {_count_booking('old', '-')} {_count_booking('new', '+')} END",
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_delete AFTER DELETE ON booking BEGIN {_count_booking('old', '-')} END",
+]
+OCCUPANCY_REBUILD = [
+    "DELETE FROM occupancy_daily",
+    "INSERT INTO occupancy_daily (hostel_id, date, bookings, beds) "
+    "SELECT hostel_id, checkin_date, COUNT(*), SUM(num_beds) FROM booking GROUP BY hostel_id, checkin_date",
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_occupancy_rollup(target, connection, **kw):
+    for statement in OCCUPANCY_TRIGGERS:
+        connection.exec_driver_sql(statement)
+    if connection.exec_driver_sql('SELECT NOT EXISTS (SELECT 1 FROM occupancy_daily)').scalar():
+        for statement in OCCUPANCY_REBUILD:
+            connection.exec_driver_sql(statement)
+
+@app.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Recount occupancy_daily from the booking table, e.g. after a raw backfill."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE') # Block booking writes while recounting
+        for statement in OCCUPANCY_TRIGGERS + OCCUPANCY_REBUILD:
+            conn.exec_driver_sql(statement)
+        conn.commit()
+    print("Occupancy rollup rebuilt.")
+
+# Bucket start for each analytics period, as SQL over occupancy_daily.date
+OCCUPANCY_PERIODS = {
+    'day': "date",
+    'week': "date(date, '-6 days', 'weekday 1')", # Monday on or before the date
+    'month': "strftime('%Y-%m-01', date)",
+}
+MAX_OCCUPANCY_DAYS = 731
+
+def _period_start(period, day):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+def _next_period(period, start):
+    if period == 'week':
+        return start + datetime.timedelta(days=7)
+    if period == 'month':
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+def hostel_occupancy(hostel, period, start, end):
+    """Bookings, beds, occupancy rate and revenue estimate per period between start and end.
+
+    Revenue is estimated as beds booked times the hostel's current listed price. Periods
+    with no bookings are included with zeros.
+    """
+    bucket = db.literal_column(OCCUPANCY_PERIODS[period])
+    counts = {date_text: (bookings, beds) for date_text, bookings, beds in db.session.execute(
+        db.select(bucket, db.func.sum(OccupancyDaily.bookings), db.func.sum(OccupancyDaily.beds))
+        .where(OccupancyDaily.hostel_id == hostel.id, OccupancyDaily.date.between(start, end))
+        .group_by(bucket))}
+
+    def summary(bookings, beds, days):
+        return {'bookings': bookings, 'beds': beds,
+                'occupancy_rate': round(beds / (hostel.total_beds * days), 4) if hostel.total_beds else None,
+                'revenue_estimate': beds * hostel.price if hostel.price is not None else None}
+
+    series = []
+    period_start = _period_start(period, start)
+    while period_start <= end:
+        period_end = _next_period(period, period_start) - datetime.timedelta(days=1)
+        days = (min(period_end, end) - max(period_start, start)).days + 1 # Only the part inside the range
+        bookings, beds = counts.get(period_start.isoformat(), (0, 0))
+        series.append({'start': period_start.isoformat(), **summary(bookings, beds, days)})
+        period_start = _next_period(period, period_start)
+    totals = summary(sum(row['bookings'] for row in series), sum(row['beds'] for row in series), (end - start).days + 1)
+    return series, totals
+
+# --- 7. Bed Holds ---
+# A hold takes beds from the inventory like a booking does, for a limited time. Confirming
+# it turns those beds into a booking; releasing it, or letting it expire, gives them back.
+
+def place_hold(hostel, checkin_date, num_beds, ttl):
+    """Hold num_beds at hostel for checkin_date for ttl seconds and commit.
+
+    Returns the new BedHold, or None if there are not enough free beds.
+    """
+    if not reserve_beds(hostel, checkin_date, num_beds):
+        db.session.rollback()
+        return None
+    hold = BedHold(hostel_id=hostel.id, date=checkin_date, num_beds=num_beds,
+                   expires_at=hold_scheduler.clock() + datetime.timedelta(seconds=ttl))
+    db.session.add(hold)
+    db.session.commit()
+    hold_scheduler.schedule(hold.id, hold.expires_at)
+    return hold
+
+def claim_hold(token, hostel_id, checkin_date, num_beds):
+    """Mark a live hold for exactly these beds as confirmed, inside the current transaction.
+
+    The caller attaches the booking and commits; the hold's beds become the booking's.
+    Returns the BedHold, or None if the hold is unknown, used up, expired or for other beds.
+    """
+    return db.session.execute(
+        db.update(BedHold)
+        .where(BedHold.token == token, BedHold.status == 'held', BedHold.expires_at > hold_scheduler.clock(),
+               BedHold.hostel_id == hostel_id, BedHold.date == checkin_date, BedHold.num_beds == num_beds)
+        .values(status='confirmed')
+        .returning(BedHold)
+    ).scalar_one_or_none()
+
+def _return_beds(holds):
+    """Give the beds of (hostel_id, date, num_beds) rows back to the inventory."""
+    totals = {}
+    for hostel_id, date, num_beds in holds:
+        totals[hostel_id, date] = totals.get((hostel_id, date), 0) + num_beds
+    for (hostel_id, date), num_beds in totals.items():
+        db.session.execute(
+            db.update(BedInventory)
+            .where(BedInventory.hostel_id == hostel_id, BedInventory.date == date)
+            .values(booked=BedInventory.booked - num_beds))
+
+def release_hold(token):
+    """Give a live hold's beds back and commit. Returns False if the hold was not live."""
+    released = db.session.execute(
+        db.update(BedHold)
+        .where(BedHold.token == token, BedHold.status == 'held')
+        .values(status='released')
+        .returning(BedHold.hostel_id, BedHold.date, BedHold.num_beds)
+    ).all()
+    _return_beds(released)
+    db.session.commit()
+    return bool(released)
+
+class HoldScheduler:
+    """Expires bed holds at their deadlines, driven by a min-heap of (expires_at, hold id).
+
+    The thread only ever waits for the earliest deadline, so thousands of holds cost one
+    timer rather than a poll of the table. The heap decides when to wake, not what to
+    expire: each run expires every due hold with one UPDATE on ix_bed_hold_due, so holds
+    that were confirmed or released are simply skipped, and holds placed by another process
+    are caught within sweep_interval. Holds live in the database, and start() reloads the
+    ones still pending. Processes that only place holds, such as web workers while
+    `flask hold-scheduler` runs elsewhere, keep no heap at all.
+    Replace `clock` to run it on simulated time.
+    """
+
+    def __init__(self, clock=datetime.datetime.utcnow, sweep_interval=60.0):
+        self.clock = clock
+        self.sweep_interval = sweep_interval
+        self._heap = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = False # Set once run() is expiring holds in this process
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='hold-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def load(self):
+        """Schedule every hold still pending in the database, e.g. after a restart."""
+        for hold_id, expires_at in db.session.execute(
+                db.select(BedHold.id, BedHold.expires_at).where(BedHold.status == 'held')):
+            self.schedule(hold_id, expires_at)
+
+    def schedule(self, hold_id, expires_at):
+        if not self._running:
+            return # Nothing here would ever pop it; the running scheduler's sweep finds the hold
+        with self._lock:
+            heapq.heappush(self._heap, (expires_at, hold_id))
+            earliest = self._heap[0] == (expires_at, hold_id)
+        if earliest:
+            self._wake.set() # The thread may be sleeping towards a later deadline
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """Expire every hold past its deadline, give its beds back and commit. Returns how many expired."""
+        now = self.clock()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+        expired = db.session.execute(
+            db.update(BedHold)
+            .where(BedHold.status == 'held', BedHold.expires_at <= now)
+            .values(status='expired')
+            .returning(BedHold.hostel_id, BedHold.date, BedHold.num_beds)
+        ).all()
+        _return_beds(expired)
+        db.session.commit()
+        return len(expired)
+
+    def run(self):
+        self._running = True
+        with app.app_context():
+            self.load()
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    self.run_due()
+            except Exception as e: # Keep the scheduler alive; the holds are retried on the next run
+                print(f"Hold scheduler error: {e}")
+            deadline = self.next_deadline()
+            timeout = self.sweep_interval
+            if deadline is not None:
+                timeout = min(timeout, max((deadline - self.clock()).total_seconds(), 0))
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+hold_scheduler = HoldScheduler()
+
+@app.cli.command('hold-scheduler')
+def hold_scheduler_command():
+    """Expire bed holds as they come due until interrupted."""
+    hold_scheduler.run()
+
+# --- 8. Response Cache ---
+# Hostel data changes rarely, so rendered hostel responses are kept in memory and revalidated
+# by ETag. Entries are tagged with cache_version, which triggers bump on any write to hostel,
+# whether through the ORM, raw SQL or another worker process; each cached request reads it
+# (one primary-key lookup) and ignores entries rendered under an older version.
+
+class ResponseCache:
+    """Bounded LRU of rendered responses with a time-to-live, shared by all request threads."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """The value stored for key under version, or None if it is missing, expired or older."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_version, value = entry
+            if expires < time.monotonic() or entry_version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+
+def cache_version():
+    """Version of the hostel data that cached responses are rendered from."""
+    # On the read pool, like the @read_only views it fronts, so a 304 never takes a writer connection
+    with db.engines.get('read', db.engine).connect() as conn:
+        return conn.scalar(db.select(CacheVersion.version).where(CacheVersion.id == 1))
+
+def cached_response(view):
+    """Serve a view from response_cache, answering If-None-Match with 304 Not Modified."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        # Read before rendering, so an entry never holds rows older than its version
+        version = cache_version()
+        cached = response_cache.get(key, version)
+        if cached is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+            response_cache.set(key, cached, version)
+        body, mimetype, etag = cached
+        response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True # Browsers may keep it but must revalidate
+        return response.make_conditional(request)
+    return wrapper
+
+CACHE_VERSION_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS hostel_cache_{action} AFTER {action.upper()} ON hostel BEGIN "
+    f"UPDATE cache_version SET version = version + 1 WHERE id = 1; END"
+    for action in ('insert', 'update', 'delete')
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_cache_version(target, connection, **kw):
+    connection.exec_driver_sql('INSERT OR IGNORE INTO cache_version (id, version) VALUES (1, 0)')
+    for statement in CACHE_VERSION_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+# --- 9. Notification Outbox ---
+# Booking handlers only insert Notification rows; NotificationWorker delivers them in the
+# background, so a slow or unreachable mail server never adds to a booking's latency.
+# Without SMTP_HOST set, notifications are printed to the console instead of emailed.
+# To try real delivery locally: python -m aiosmtpd -n -l localhost:8025 and SMTP_HOST=localhost SMTP_PORT=8025
+
+def booking_notifications(hostel, booking):
+    """Column values for the owner and guest emails about a new booking."""
+    checkin = booking.checkin_date.isoformat()
+    return [
+        dict(
+            recipient=hostel.owner_email,
+            subject=f"New Booking for {hostel.name} by {booking.user_name}",
+            body=f"Details: {booking.num_beds} beds on {checkin}. User: {booking.user_name} {booking.user_email} {booking.user_phone}."
+        ),
+        dict(
+            recipient=booking.user_email,
+            subject=f"Your Booking Confirmation for {hostel.name}",
+            body=f"Hi {booking.user_name},\nYour booking for {booking.num_beds} beds at {hostel.name} on {checkin} is confirmed."
+        ),
+    ]
+
+def queue_booking_notifications(hostel, booking):
+    """Add the owner and guest emails for a new booking to the current transaction."""
+    db.session.add_all([Notification(booking=booking, **values) for values in booking_notifications(hostel, booking)])
+
+def send_notification(recipient, subject, body):
+    if not app.config['SMTP_HOST']:
+        print(f"\n--- NOTIFICATION to {recipient} ---\n{subject}\n{body}\n-----------------------------------\n")
+        return
+    message = EmailMessage()
+    message['From'] = app.config['MAIL_FROM']
+    message['To'] = recipient
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(app.config['SMTP_HOST'], app.config['SMTP_PORT'], timeout=30) as smtp:
+        if app.config['SMTP_USER']:
+            smtp.starttls()
+            smtp.login(app.config['SMTP_USER'], app.config['SMTP_PASSWORD'])
+        smtp.send_message(message)
+
+class NotificationWorker:
+    """Drains the notification outbox in batches, retrying failures with exponential backoff.
+
+    Batches are claimed with a single UPDATE ... RETURNING, so several workers (or processes)
+    can drain the same table without sending anything twice. Rows left in 'sending' by a
+    crashed worker are picked up again once their claim is older than claim_timeout.
+    """
+
+    def __init__(self, batch_size=50, pool_size=8, poll_interval=5.0, max_attempts=6,
+                 backoff=datetime.timedelta(seconds=30), max_backoff=datetime.timedelta(hours=1), claim_timeout=datetime.timedelta(minutes=5)):
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='notification-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        with ThreadPoolExecutor(self.pool_size, thread_name_prefix='notify') as pool:
+            while not self._stop.is_set():
+                try:
+                    with app.app_context():
+                        delivered = self.drain_batch(pool)
+                except Exception as e: # Keep the worker alive; the batch is retried after claim_timeout
+                    print(f"Notification worker error: {e}")
+                    delivered = 0
+                if not delivered:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+
+    def drain_batch(self, pool):
+        """Claim one batch, deliver it on the pool and record the outcomes. Returns the batch size."""
+        now = datetime.datetime.utcnow()
+        due = (db.select(Notification.id)
+               .where(db.or_(db.and_(Notification.status == 'pending', Notification.next_attempt_at <= now),
+                             db.and_(Notification.status == 'sending', Notification.claimed_at < now - self.claim_timeout)))
+               .order_by(Notification.id)
+               .limit(self.batch_size))
+        claimed = db.session.execute(
+            db.update(Notification)
+            .where(Notification.id.in_(due.scalar_subquery()))
+            .values(status='sending', claimed_at=now)
+            .returning(Notification.id, Notification.recipient, Notification.subject, Notification.body, Notification.attempts)
+        ).all()
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        def deliver(row):
+            try:
+                send_notification(row.recipient, row.subject, row.body)
+                return row, None
+            except Exception as e:
+                return row, str(e)
+
+        now = datetime.datetime.utcnow()
+        for row, error in pool.map(deliver, claimed):
+            if error is None:
+                values = {'status': 'sent', 'attempts': row.attempts + 1, 'last_error': None}
+            elif row.attempts + 1 >= self.max_attempts:
+                values = {'status': 'failed', 'attempts': row.attempts + 1, 'last_error': error}
+            else:
+                delay = min(self.backoff * 2 ** row.attempts, self.max_backoff) * random.uniform(0.8, 1.2)
+                values = {'status': 'pending', 'attempts': row.attempts + 1, 'last_error': error,
+                          'next_attempt_at': now + delay}
+            db.session.execute(db.update(Notification).where(Notification.id == row.id).values(**values))
+        db.session.commit()
+        return len(claimed)
+
+notification_worker = NotificationWorker()
+
+@event.listens_for(Session, 'before_flush')
+def _note_new_notifications(session, flush_context, instances):
+    if any(isinstance(obj, Notification) for obj in session.new):
+        session.info['notifications_queued'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _wake_notification_worker(session):
+    if session.info.pop('notifications_queued', False):
+        notification_worker.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_new_notifications(session):
+    session.info.pop('notifications_queued', None)
+
+@app.cli.command('notification-worker')
+def notification_worker_command():
+    """Deliver queued notifications until interrupted."""
+    notification_worker.run()
+
+# --- 10. Live Updates ---
+# GET /api/stream pushes availability and booking changes to browsers as Server-Sent Events.
+# Triggers append every change to live_event, whoever made it (this process, another worker,
+# a bulk insert), and one LiveFeed thread tails that table for all connected clients.
+# Booking events carry no guest details, since every client receives them.
+
+# live_event rows kept for clients resuming after a server restart. A trigger prunes them,
+# every 1000th event, since the feed thread only runs while someone is subscribed.
+LIVE_EVENT_RETENTION = 10000
+
+LIVE_EVENT_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS live_availability_insert AFTER INSERT ON bed_inventory WHEN new.booked != 0 BEGIN "
+    "INSERT INTO live_event (kind, hostel_id, payload) VALUES ('availability', new.hostel_id, json_object("
+    "'hostel_id', new.hostel_id, 'date', new.date, 'available', new.capacity - new.booked, 'change', -new.booked)); END",
+    "CREATE TRIGGER IF NOT EXISTS live_availability_update AFTER UPDATE OF booked ON bed_inventory "
+    "WHEN new.booked != old.booked BEGIN "
+    "INSERT INTO live_event (kind, hostel_id, payload) VALUES ('availability', new.hostel_id, json_object("
+    "'hostel_id', new.hostel_id, 'date', new.date, 'available', new.capacity - new.booked, "
+    "'change', old.booked - new.booked)); END",
+    "CREATE TRIGGER IF NOT EXISTS live_booking_insert AFTER INSERT ON booking BEGIN "
+    "INSERT INTO live_event (kind, hostel_id, payload) VALUES ('booking', new.hostel_id, json_object("
+    "'id', new.id, 'hostel_id', new.hostel_id, 'checkin_date', new.checkin_date, 'num_beds', new.num_beds)); END",
+    f"CREATE TRIGGER IF NOT EXISTS live_event_retention AFTER INSERT ON live_event WHEN new.id % 1000 = 0 BEGIN "
+    f"DELETE FROM live_event WHERE id <= new.id - {LIVE_EVENT_RETENTION}; END",
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_live_event_triggers(target, connection, **kw):
+    for statement in LIVE_EVENT_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+class LiveFeed:
+    """Fans live_event rows out to every /api/stream client from a single reader thread.
+
+    The thread reads new rows once per local commit (or every poll_interval, for writes
+    from other processes) into a ring buffer shared by all subscribers. A subscriber holds
+    no queue, only the id of the last event it sent, and sleeps on a shared Condition, so
+    database reads do not grow with the number of clients and an idle one costs one
+    blocked wait. A client resuming from an id that has left the buffer gets a `reset`
+    event and should refetch what it shows.
+    """
+
+    def __init__(self, buffer_size=4096, poll_interval=1.0, heartbeat=15.0):
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.events = deque(maxlen=buffer_size) # (id, kind, hostel_id, payload), oldest first
+        self.last_id = 0
+        self.subscribers = 0
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                with app.app_context():
+                    self.load()
+                self._thread = threading.Thread(target=self.run, name='live-feed', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def load(self):
+        """Fill the buffer with the newest events, so clients can resume across a restart."""
+        rows = db.session.execute(
+            db.select(LiveEvent.id, LiveEvent.kind, LiveEvent.hostel_id, LiveEvent.payload)
+            .order_by(LiveEvent.id.desc()).limit(self.events.maxlen)).all()
+        with self._condition:
+            self.events.extend(tuple(row) for row in reversed(rows))
+            self.last_id = rows[0].id if rows else 0
+
+    def poll(self):
+        """Buffer events committed since the last poll and wake the subscribers. Returns how many."""
+        rows = db.session.execute(
+            db.select(LiveEvent.id, LiveEvent.kind, LiveEvent.hostel_id, LiveEvent.payload)
+            .where(LiveEvent.id > self.last_id).order_by(LiveEvent.id).limit(self.events.maxlen)).all()
+        if rows:
+            with self._condition:
+                self.events.extend(tuple(row) for row in rows)
+                self.last_id = rows[-1].id
+                self._condition.notify_all()
+        return len(rows)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    read = self.poll()
+            except Exception as e: # Keep the feed alive; the rows are read again on the next poll
+                print(f"Live feed error: {e}")
+                read = 0
+            if read < self.events.maxlen:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _events_after(self, last_id):
+        # Caller holds self._condition. None means events after last_id are no longer buffered.
+        if last_id >= self.last_id:
+            return []
+        if not self.events or self.events[0][0] > last_id + 1:
+            return None
+        pending = []
+        for event in reversed(self.events):
+            if event[0] <= last_id:
+                break
+            pending.append(event)
+        pending.reverse()
+        return pending
+
+    def subscribe(self, last_id=None, hostel_id=None):
+        """Yield SSE messages for events after last_id (or from now on), plus heartbeats."""
+        with self._condition:
+            if last_id is None or last_id > self.last_id:
+                last_id = self.last_id
+            self.subscribers += 1
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                with self._condition:
+                    pending = self._events_after(last_id)
+                    if pending == []:
+                        self._condition.wait(self.heartbeat)
+                        pending = self._events_after(last_id)
+                    head = self.last_id
+                if pending is None:
+                    last_id = head
+                    yield f'id: {head}\nevent: reset\ndata: {{}}\n\n'
+                elif not pending:
+                    yield ': heartbeat\n\n' # Keeps proxies from closing the connection and detects dead clients
+                else:
+                    for event_id, kind, event_hostel_id, payload in pending:
+                        if hostel_id is None or event_hostel_id == hostel_id:
+                            yield f'id: {event_id}\nevent: {kind}\ndata: {payload}\n\n'
+                    last_id = pending[-1][0]
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+live_feed = LiveFeed()
+
+@event.listens_for(Session, 'after_commit')
+def _wake_live_feed(session):
+    live_feed.wake() # Only sets an event; the feed thread reads at most once per wake-up
+
+# --- 11. Request Metrics ---
+# Prometheus-style metrics kept in process memory and served as text on /metrics. An
+# observation is a bisect plus a short locked update, cheap enough to leave on in production.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class Counter:
+    """Monotonic counter per combination of label values."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f'{self.name}{_label_text(self.labels, label_values)} {value}' for label_values, value in values]
+        return lines
+
+class Histogram:
+    """Bucketed distribution per combination of label values."""
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name, self.help_text, self.buckets, self.labels = name, help_text, buckets, labels
+        self._series = {} # label values -> [count per bucket..., count above the last bucket, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value) # Buckets are upper bounds, inclusive
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((label_values, list(series)) for label_values, series in self._series.items())
+        for label_values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), label_values + (bound,))} {cumulative}")
+            labels = _label_text(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {series[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+request_latency = Histogram('http_request_duration_seconds', 'Time to produce a response, by view.',
+                            LATENCY_BUCKETS, ('endpoint', 'method'))
+request_count = Counter('http_requests_total', 'Responses by view and status code.', ('endpoint', 'method', 'status'))
+request_queries = Histogram('http_request_db_queries', 'SQL statements executed per request, by view.',
+                            QUERY_COUNT_BUCKETS, ('endpoint',))
+request_db_time = Histogram('http_request_db_seconds', 'Time spent in SQL per request, by view.',
+                            LATENCY_BUCKETS, ('endpoint',))
+query_count = Counter('db_queries_total', 'SQL statements executed, including background work.')
+query_time = Counter('db_query_seconds_total', 'Time spent executing SQL statements.')
+slow_query_count = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS, by view.', ('endpoint',))
+METRICS = [request_latency, request_count, request_queries, request_db_time, query_count, query_time,
+           slow_query_count]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    query_count.inc()
+    query_time.inc(amount=elapsed)
+    endpoint = None
+    if has_request_context():
+        endpoint = request.endpoint
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0) + elapsed
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        slow_query_count.inc(endpoint or '-')
+        app.logger.warning('Slow query (%.0f ms) in %s: %s', elapsed * 1000, endpoint or 'background work', statement)
+
+def _forget_failed_query(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get('query_started'):
+        exception_context.connection.info['query_started'].pop()
+
+with app.app_context():
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _forget_failed_query)
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    # Streamed bodies are still being produced at this point; their time is not included
+    if 'request_started' in g:
+        endpoint = request.endpoint or '<unmatched>'
+        request_latency.observe(time.perf_counter() - g.request_started, endpoint, request.method)
+        request_count.inc(endpoint, request.method, response.status_code)
+        request_queries.observe(g.get('db_queries', 0), endpoint)
+        request_db_time.observe(g.get('db_seconds', 0), endpoint)
+    return response
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+# --- 12. Admission Control ---
+# Every booking write ends up queueing on SQLite's single writer, so during a rush writes are
+# rationed before they get there. Each client IP and guest email has a token bucket, and at
+# most WRITE_CONCURRENCY write requests run at once while the rest wait up to
+# WRITE_QUEUE_TIMEOUT for a slot. Refusals are 429 with Retry-After. Buckets live in this
+# process, or with RATE_LIMIT_DB in a small SQLite file that all workers on the host share.
+
+class TokenBuckets:
+    """In-memory token buckets keyed by client, kept in least-recently-used order.
+
+    A bucket left alone for burst / rate seconds has refilled, which is the same as having
+    no bucket, so idle ones are dropped from the old end as requests arrive. Memory is one
+    small entry per client seen within that window.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.idle = burst / rate
+        self._buckets = OrderedDict() # key -> (tokens, last request time)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend a token from key's bucket. Returns 0 if there was one, else seconds until there is."""
+        now = time.monotonic()
+        with self._lock:
+            while self._buckets:
+                oldest, (_, updated) = next(iter(self._buckets.items()))
+                if now - updated < self.idle:
+                    break
+                del self._buckets[oldest]
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - allowed, now)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+class SqliteTokenBuckets:
+    """Token buckets in a SQLite file, so every worker process on the host draws on the same ones.
+
+    A take() is one UPSERT ... RETURNING on a per-thread connection. Nothing in the file is
+    worth an fsync, so it runs with synchronous=OFF. If the file cannot be used, requests
+    are let through rather than refused.
+    """
+
+    # SET expressions all see the row as it was, so the refill is spelled out in each
+    _REFILLED = "MIN(:burst, tokens + (:now - updated) * :rate)"
+    TAKE = (f"INSERT INTO token_bucket (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1) "
+            f"ON CONFLICT (key) DO UPDATE SET tokens = {_REFILLED} - ({_REFILLED} >= 1), "
+            f"allowed = {_REFILLED} >= 1, updated = :now RETURNING tokens, allowed")
+
+    def __init__(self, path, rate, burst):
+        self.path, self.rate, self.burst = path, rate, burst
+        self.idle = burst / rate
+        self._local = threading.local()
+        self._purged = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS token_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                         'updated REAL NOT NULL, allowed INTEGER NOT NULL) WITHOUT ROWID')
+        return conn
+
+    def take(self, key):
+        now = time.time() # Wall clock: the rows are compared across processes
+        try:
+            conn = self._connection()
+            if now - self._purged > self.idle:
+                self._purged = now
+                conn.execute('DELETE FROM token_bucket WHERE updated < ?', (now - self.idle,))
+            tokens, allowed = conn.execute(self.TAKE, {'key': key, 'now': now, 'rate': self.rate,
+                                                      'burst': self.burst}).fetchone()
+        except sqlite3.Error as e:
+            app.logger.warning('Rate limit store unavailable, letting request through: %s', e)
+            return 0
+        return 0 if allowed else (1 - tokens) / self.rate
+
+if app.config['RATE_LIMIT_PER_MINUTE'] <= 0:
+    rate_limiter = None
+elif app.config['RATE_LIMIT_DB']:
+    rate_limiter = SqliteTokenBuckets(app.config['RATE_LIMIT_DB'], app.config['RATE_LIMIT_PER_MINUTE'] / 60,
+                                      app.config['RATE_LIMIT_BURST'])
+else:
+    rate_limiter = TokenBuckets(app.config['RATE_LIMIT_PER_MINUTE'] / 60, app.config['RATE_LIMIT_BURST'])
+write_slots = threading.BoundedSemaphore(app.config['WRITE_CONCURRENCY']) if app.config['WRITE_CONCURRENCY'] > 0 else None
+
+admission_rejections = Counter('admission_rejected_total', 'Write requests refused with 429, by reason.', ('reason',))
+METRICS.append(admission_rejections)
+
+def rate_limit_wait(client_ip, email=None):
+    """Seconds until this client may write again (0 if it may now), spending a token if so."""
+    if rate_limiter is None:
+        return 0
+    wait = rate_limiter.take(f'ip:{client_ip}')
+    if not wait and isinstance(email, str) and email.strip():
+        wait = rate_limiter.take(f'email:{email.strip().lower()}')
+    return math.ceil(wait)
+
+def write_retry_after():
+    # Spread the retries of a shed burst instead of sending them all back at once
+    return math.ceil(app.config['WRITE_QUEUE_TIMEOUT'] * random.uniform(1, 2))
+
+def too_many_requests(retry_after, reason):
+    admission_rejections.inc(reason)
+    response = jsonify({"error": "Too many booking requests, please try again later", "retry_after": retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def admission_controlled(view):
+    """Rate-limit a write view per client IP and guest email, then run it under the write cap.
+
+    GET requests pass straight through, so a form page can share its route with its POST.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+        data = request.get_json(silent=True) if request.is_json else request.form
+        wait = rate_limit_wait(request.remote_addr, data.get('user_email') if isinstance(data, Mapping) else None)
+        if wait:
+            return too_many_requests(wait, 'rate_limit')
+        if write_slots is None:
+            return view(*args, **kwargs)
+        if not write_slots.acquire(timeout=app.config['WRITE_QUEUE_TIMEOUT']):
+            return too_many_requests(write_retry_after(), 'write_queue')
+        try:
+            return view(*args, **kwargs)
+        finally:
+            write_slots.release()
+    return wrapper
+
+# --- 13. API Routes (Endpoints) ---
 
 @app.route('/')
 def index():
     return "Hostel Booking Backend is running! Access /api/bookings for data."
 
+REQUIRED_BOOKING_FIELDS = ['hostel_id', 'hostel_name', 'checkin_date', 'num_beds', 'user_name', 'user_email', 'user_phone']
+
+def _json_int(value):
+    # int() would quietly book 1 bed for 1.9 or true; a JSON count must be a whole number already
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{value!r} is not an integer")
+    return value
+
+def clean_booking(data):
+    """Validate one booking payload and return its Booking fields with proper types.
+
+    Raises ValueError with a message suitable for the client.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Booking must be a JSON object")
+    missing = [field for field in REQUIRED_BOOKING_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    try:
+        fields = {field: data[field] for field in REQUIRED_BOOKING_FIELDS}
+        fields['hostel_id'] = int(data['hostel_id'])
+        fields['checkin_date'] = datetime.date.fromisoformat(data['checkin_date'])
+        fields['num_beds'] = _json_int(data['num_beds'])
+        if fields['num_beds'] <= 0:
+            raise ValueError("Number of beds must be positive.")
+    except (TypeError, ValueError):
+        raise ValueError("checkin_date must be YYYY-MM-DD and num_beds a positive integer")
+    return fields
+
+def booking_created(booking_id, replayed=False):
+    response = jsonify({"message": "Booking created successfully!", "booking_id": booking_id})
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response, 201
+
 @app.route('/api/bookings', methods=['POST'])
+@admission_controlled
 def create_booking():
     data = request.get_json() # Get JSON data sent from frontend
 
     # Basic validation of incoming data
     if not data:
         return jsonify({"error": "No data provided"}), 400
-    required_fields = ['hostel_id', 'hostel_name', 'checkin_date', 'num_beds', 'user_name', 'user_email', 'user_phone']
-    if not all(field in data for field in required_fields):
-        missing = [field for field in required_fields if field not in data]
-        return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
 
-    new_booking = Booking(
-        hostel_id=data['hostel_id'],
-        hostel_name=data['hostel_name'],
-        checkin_date=data['checkin_date'],
-        num_beds=data['num_beds'],
-        user_name=data['user_name'],
-        user_email=data['user_email'],
-        user_phone=data['user_phone']
-    )
+    # A client retrying with the same Idempotency-Key gets the booking it already made
+    key = request.headers.get('Idempotency-Key')
+    request_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    if key:
+        if len(key) > 255:
+            return jsonify({"error": "Idempotency-Key must be at most 255 characters"}), 400
+        try:
+            booking_id = find_idempotent_booking(key, request_hash)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 422
+        if booking_id:
+            return booking_created(booking_id, replayed=True)
 
     try:
+        fields = clean_booking(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    checkin_date, num_beds = fields['checkin_date'], fields['num_beds']
+
+    hostel = db.session.get(Hostel, fields['hostel_id'])
+    if not hostel:
+        return jsonify({"error": f"Hostel {data['hostel_id']} not found"}), 404
+
+    new_booking = Booking(**fields)
+
+    try:
+        if not reserve_beds(hostel, checkin_date, num_beds):
+            db.session.rollback()
+            return jsonify({"error": "Not enough beds available",
+                            "available": beds_available(hostel, checkin_date)}), 409
         db.session.add(new_booking)
+        queue_booking_notifications(hostel, new_booking) # Sent by notification_worker after commit
+        if key:
+            db.session.flush()
+            if not claim_idempotency_key(key, request_hash, new_booking.id):
+                # A concurrent request with the same key committed first; answer with its booking
+                db.session.rollback()
+                return booking_created(find_idempotent_booking(key, request_hash), replayed=True)
         db.session.commit()
 
-        # --- Messaging Logic (Server-side Placeholder) ---
-        # In a real application, this is where you'd send actual emails/SMS/WhatsApp
-        # to the hostel owner and the user.
-        # You would use libraries like 'smtplib' for email or 'Twilio' for SMS/WhatsApp.
-
-        # Fetch owner info from the database (Hostel model)
-        hostel = Hostel.query.get(data['hostel_id'])
-        if hostel:
-            print(f"\n--- NEW BOOKING NOTIFICATION ---")
-            print(f"Hostel: {hostel.name}")
-            print(f"Check-in Date: {data['checkin_date']}")
-            print(f"Number of Beds: {data['num_beds']}")
-            print(f"Booked by: {data['user_name']} ({data['user_email']}, {data['user_phone']})")
-            print(f"Owner: {hostel.owner_name} (Phone: {hostel.owner_phone}, Email: {hostel.owner_email})")
-            print(f"-----------------------------------\n")
-
-            # Example of how you'd call a function to send a real email:
-            # from your_mail_module import send_email
-            # send_email(
-            #     to_email=hostel.owner_email,
-            #     subject=f"New Booking for {hostel.name} by {data['user_name']}",
-            #     body=f"Details: {data['num_beds']} beds on {data['checkin_date']}. User: {data['user_name']} {data['user_phone']}."
-            # )
-            # send_email(
-            #     to_email=data['user_email'],
-            #     subject=f"Your Booking Confirmation for {hostel.name}",
-            #     body=f"Hi {data['user_name']},\nYour booking for {data['num_beds']} beds at {hostel.name} on {data['checkin_date']} is confirmed."
-            # )
-        else:
-            print(f"WARNING: Could not find owner info for hostel_id {data['hostel_id']} in DB.")
-
-
-        return jsonify({"message": "Booking created successfully!", "booking_id": new_booking.id}), 201
+        return booking_created(new_booking.id)
+    except ValueError as e: # The concurrent request used the same key for a different booking
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 422
     except Exception as e:
         db.session.rollback() # Rollback in case of error
         print(f"Error creating booking: {e}")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+# Page sizes for GET /api/bookings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(booking):
+    raw = f"{booking.timestamp.isoformat()}|{booking.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    timestamp, booking_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.datetime.fromisoformat(timestamp), int(booking_id)
+
+# Partner/agency batches: at most this many rows per request, committed this many at a time
+MAX_BATCH_SIZE = 10000
+BATCH_CHUNK_SIZE = 500
+
+@app.route('/api/bookings/batch', methods=['POST'])
+@admission_controlled
+def create_bookings_batch():
+    """Create many bookings in one request from a JSON array or an NDJSON body.
+
+    Every row gets a result in request order: created (with booking_id), invalid, not_found,
+    full (not enough beds) or error. Valid rows are inserted in chunked transactions, so a
+    failure only affects the chunk it happened in.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    rows.append(None) # Reported as invalid below
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({"error": "Expected a JSON array of bookings or an NDJSON body"}), 400
+    if not rows:
+        return jsonify({"error": "No data provided"}), 400
+    if len(rows) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} bookings per batch"}), 413
+
+    # Validate the whole batch up front and fetch every referenced hostel in one query
+    results = [None] * len(rows)
+    valid = []
+    for index, data in enumerate(rows):
+        try:
+            valid.append((index, clean_booking(data)))
+        except ValueError as e:
+            results[index] = {"index": index, "status": "invalid", "error": str(e)}
+    hostel_ids = {fields['hostel_id'] for _, fields in valid}
+    hostels = {hostel.id: hostel for hostel in db.session.scalars(db.select(Hostel).where(Hostel.id.in_(hostel_ids)))}
+
+    for start in range(0, len(valid), BATCH_CHUNK_SIZE):
+        chunk = valid[start:start + BATCH_CHUNK_SIZE]
+        accepted = []
+        try:
+            for index, fields in chunk:
+                hostel = hostels.get(fields['hostel_id'])
+                if not hostel:
+                    results[index] = {"index": index, "status": "not_found", "error": f"Hostel {fields['hostel_id']} not found"}
+                elif not reserve_beds(hostel, fields['checkin_date'], fields['num_beds']):
+                    results[index] = {"index": index, "status": "full", "error": "Not enough beds available"}
+                else:
+                    accepted.append((index, hostel, fields))
+            if accepted:
+                # reserve_beds() has taken SQLite's write lock for this transaction, so no other
+                # writer can claim these ids before the commit; that lets both tables be
+                # written with a single executemany each instead of one INSERT per row.
+                next_id = db.session.scalar(db.select(db.func.coalesce(db.func.max(Booking.id), 0))) + 1
+                booking_rows, notification_rows = [], []
+                for offset, (index, hostel, fields) in enumerate(accepted):
+                    booking_rows.append({'id': next_id + offset, **fields})
+                    notification_rows += [{'booking_id': next_id + offset, **values}
+                                          for values in booking_notifications(hostel, Booking(**fields))]
+                db.session.execute(db.insert(Booking), booking_rows)
+                db.session.execute(db.insert(Notification), notification_rows)
+            db.session.commit()
+            for offset, (index, _, _) in enumerate(accepted):
+                results[index] = {"index": index, "status": "created", "booking_id": next_id + offset}
+            if accepted:
+                notification_worker.wake() # Core inserts bypass the after_commit hook
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating booking batch: {e}")
+            for index, _ in chunk:
+                results[index] = {"index": index, "status": "error", "error": "Internal server error"}
+
+    summary = {status: sum(1 for result in results if result['status'] == status)
+               for status in ('created', 'invalid', 'not_found', 'full', 'error')}
+    return jsonify({**summary, "results": results}), 200
+
 @app.route('/api/bookings', methods=['GET'])
+@read_only
 def get_bookings():
-    # Fetch all bookings from the database
-    bookings = Booking.query.order_by(Booking.timestamp.desc()).all()
-    # Convert list of Booking objects to a list of dictionaries for JSON response
-    output = []
-    for booking in bookings:
-        output.append({
-            'id': booking.id,
-            'hostel_id': booking.hostel_id,
-            'hostel_name': booking.hostel_name,
-            'checkin_date': booking.checkin_date,
-            'num_beds': booking.num_beds,
-            'user_name': booking.user_name,
-            'user_email': booking.user_email,
-            'user_phone': booking.user_phone,
-            'timestamp': booking.timestamp.isoformat() # Convert datetime object to ISO format string
-        })
-    return jsonify(output)
+    # Newest first; (timestamp, id) is unique, so it doubles as the pagination key
+    query = db.select(Booking).order_by(Booking.timestamp.desc(), Booking.id.desc())
+
+    # Optional filters: ?hostel_id=1&from=2025-07-01&to=2025-07-31&email=a@b.com
+    try:
+        if request.args.get('hostel_id'):
+            query = query.where(Booking.hostel_id == int(request.args['hostel_id']))
+        if request.args.get('from'):
+            query = query.where(Booking.checkin_date >= datetime.date.fromisoformat(request.args['from']))
+        if request.args.get('to'):
+            query = query.where(Booking.checkin_date <= datetime.date.fromisoformat(request.args['to']))
+        if request.args.get('email'):
+            query = query.where(Booking.user_email == request.args['email'])
+        if request.args.get('cursor'):
+            timestamp, booking_id = decode_cursor(request.args['cursor'])
+            query = query.where(db.or_(Booking.timestamp < timestamp,
+                                       db.and_(Booking.timestamp == timestamp, Booking.id < booking_id)))
+        limit = request.args.get('limit', type=int)
+    except ValueError:
+        return jsonify({"error": "Invalid hostel_id, from, to or cursor parameter"}), 400
+    if limit is not None and limit < 1:
+        # SQLite reads LIMIT -1 as no limit at all
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    # NDJSON streams every matching row (or `limit` rows) without holding them in memory
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        if limit:
+            query = query.limit(limit)
+        def generate():
+            for booking in db.session.scalars(query.execution_options(yield_per=500)):
+                yield json.dumps(booking.to_dict()) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    bookings = db.session.scalars(query.limit(limit + 1)).all()
+    response = jsonify([booking.to_dict() for booking in bookings[:limit]])
+    if len(bookings) > limit:
+        # Clients pass this back as ?cursor= to fetch the next page
+        response.headers['X-Next-Cursor'] = encode_cursor(bookings[limit - 1])
+    return response
+
+# Owner exports: rows fetched and written out per batch, in the order below
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = ('id', 'checkin_date', 'num_beds', 'user_name', 'user_email', 'user_phone', 'timestamp')
+
+def _spreadsheet_safe(value):
+    # Guest-entered text starting like a formula would be evaluated when the CSV is opened.
+    # An international phone number (+ and digits only) is left alone.
+    if value and value[0] in '=+-@\t\r' and not (value[0] == '+' and value[1:].isdigit() and value.isascii()):
+        return "'" + value
+    return value
+
+@app.route('/api/hostels/<int:hostel_id>/bookings/export', methods=['GET'])
+@read_only
+def export_hostel_bookings(hostel_id):
+    # ?from=2026-07-01&to=2026-07-31&format=csv|ndjson, streamed in check-in date order
+    if not db.session.get(Hostel, hostel_id):
+        return jsonify({"error": "Hostel not found"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        start = request.args.get('from') and datetime.date.fromisoformat(request.args['from'])
+        end = request.args.get('to') and datetime.date.fromisoformat(request.args['to'])
+    except ValueError:
+        return jsonify({"error": "Invalid from or to date"}), 400
+
+    # Plain column tuples rather than Booking objects: no identity map or per-row instances.
+    # (hostel_id, checkin_date, rowid) is the order of ix_booking_hostel_checkin, so no sort.
+    query = (db.select(*(getattr(Booking, column) for column in EXPORT_COLUMNS))
+             .where(Booking.hostel_id == hostel_id)
+             .order_by(Booking.checkin_date, Booking.id)
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    if start:
+        query = query.where(Booking.checkin_date >= start)
+    if end:
+        query = query.where(Booking.checkin_date <= end)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue() # Headers and the first bytes go out before the query runs
+        for batch in db.session.execute(query).partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows((booking_id, checkin_date.isoformat(), num_beds, _spreadsheet_safe(user_name),
+                              _spreadsheet_safe(user_email), _spreadsheet_safe(user_phone), timestamp.isoformat())
+                             for booking_id, checkin_date, num_beds, user_name, user_email, user_phone, timestamp
+                             in batch)
+            yield buffer.getvalue()
+
+    def generate_ndjson():
+        for batch in db.session.execute(query).partitions():
+            yield ''.join(json.dumps({'id': booking_id, 'checkin_date': checkin_date.isoformat(), 'num_beds': num_beds,
+                                      'user_name': user_name, 'user_email': user_email, 'user_phone': user_phone,
+                                      'timestamp': timestamp.isoformat()}) + '\n'
+                          for booking_id, checkin_date, num_beds, user_name, user_email, user_phone, timestamp
+                          in batch)
+
+    filename = f"hostel-{hostel_id}-bookings-{start or 'all'}-{end or 'all'}.{fmt}"
+    generate, mimetype = {'csv': (generate_csv, 'text/csv'), 'ndjson': (generate_ndjson, 'application/x-ndjson')}[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/api/hostels', methods=['GET'])
+@cached_response
+@read_only
 def get_hostels():
     # Fetch all hostels from the database
     hostels = Hostel.query.all()
@@ -163,10 +1631,110 @@ def get_hostels():
         })
     return jsonify(output)
 
-# --- 5. Run the Flask App ---
+@app.route('/api/hostels/<int:hostel_id>/occupancy', methods=['GET'])
+@read_only
+def get_hostel_occupancy(hostel_id):
+    # Owner dashboard: ?period=day|week|month&from=2026-07-01&to=2026-09-30 (default: the next 30 days)
+    hostel = db.session.get(Hostel, hostel_id)
+    if not hostel:
+        return jsonify({"error": f"Hostel {hostel_id} not found"}), 404
+    period = request.args.get('period', 'day')
+    try:
+        start = datetime.date.fromisoformat(request.args['from']) if request.args.get('from') else datetime.date.today()
+        end = datetime.date.fromisoformat(request.args['to']) if request.args.get('to') else start + datetime.timedelta(days=29)
+    except ValueError:
+        return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+    if period not in OCCUPANCY_PERIODS or not 0 <= (end - start).days < MAX_OCCUPANCY_DAYS:
+        return jsonify({"error": f"period must be day, week or month, and from..to at most {MAX_OCCUPANCY_DAYS} days"}), 400
+
+    series, totals = hostel_occupancy(hostel, period, start, end)
+    return jsonify({'hostel_id': hostel.id, 'period': period, 'from': start.isoformat(), 'to': end.isoformat(),
+                    'total_beds': hostel.total_beds, 'price': hostel.price, 'totals': totals, 'series': series})
+
+@app.route('/api/holds', methods=['POST'])
+@admission_controlled
+def create_hold():
+    # Hold beds while the guest fills in their details: {"hostel_id", "checkin_date", "num_beds", "ttl" (seconds, optional)}
+    data = request.get_json(silent=True) or {}
+    try:
+        hostel_id = int(data['hostel_id'])
+        checkin_date = datetime.date.fromisoformat(data['checkin_date'])
+        num_beds = _json_int(data['num_beds'])
+        ttl = int(data.get('ttl', app.config['HOLD_TTL']))
+        if num_beds <= 0 or not 0 < ttl <= app.config['HOLD_MAX_TTL']:
+            raise ValueError
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "hostel_id, checkin_date (YYYY-MM-DD) and a positive num_beds are required, "
+                                 f"and ttl must be 1-{app.config['HOLD_MAX_TTL']} seconds"}), 400
+
+    hostel = db.session.get(Hostel, hostel_id)
+    if not hostel:
+        return jsonify({"error": f"Hostel {hostel_id} not found"}), 404
+    hold = place_hold(hostel, checkin_date, num_beds, ttl)
+    if hold is None:
+        return jsonify({"error": "Not enough beds available", "available": beds_available(hostel, checkin_date)}), 409
+    return jsonify(hold.to_dict()), 201
+
+@app.route('/api/holds/<token>/confirm', methods=['POST'])
+@admission_controlled
+def confirm_hold(token):
+    # Book the held beds: {"user_name", "user_email", "user_phone"}
+    data = request.get_json(silent=True) or {}
+    hold = db.session.scalar(db.select(BedHold).where(BedHold.token == token))
+    if not hold:
+        return jsonify({"error": "Hold not found"}), 404
+    missing = [field for field in ('user_name', 'user_email', 'user_phone') if not data.get(field)]
+    if missing:
+        return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
+
+    hostel = db.session.get(Hostel, hold.hostel_id)
+    try:
+        hold = claim_hold(token, hold.hostel_id, hold.date, hold.num_beds)
+        if not hold:
+            db.session.rollback()
+            return jsonify({"error": "Hold has expired or was already confirmed or released"}), 410
+        new_booking = Booking(hostel_id=hostel.id, hostel_name=hostel.name, checkin_date=hold.date, num_beds=hold.num_beds,
+                              user_name=data['user_name'], user_email=data['user_email'], user_phone=data['user_phone'])
+        db.session.add(new_booking)
+        hold.booking = new_booking
+        queue_booking_notifications(hostel, new_booking) # Sent by notification_worker after commit
+        db.session.commit()
+        return booking_created(new_booking.id)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error confirming hold: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+@app.route('/api/holds/<token>', methods=['DELETE'])
+def delete_hold(token):
+    if not release_hold(token):
+        return jsonify({"error": "Hold not found or no longer active"}), 404
+    return jsonify({"message": "Hold released"})
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    # Server-Sent Events: `availability` and `booking` events, for every hostel or only ?hostel_id=.
+    # EventSource sends the last id it saw as Last-Event-ID when it reconnects; ?last_event_id= does the same.
+    try:
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_id = int(last_id) if last_id else None
+        hostel_id = int(request.args['hostel_id']) if request.args.get('hostel_id') else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID and hostel_id must be integers"}), 400
+    live_feed.start()
+    return Response(live_feed.subscribe(last_id, hostel_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- 14. Run the Flask App ---
 if __name__ == '__main__':
     with app.app_context():
         db.create_all() # Create database tables based on models if they don't exist
+        upgrade_schema()
         # Add initial hostel data if the Hostel table is empty
         if Hostel.query.count() == 0:
             print("Adding initial hostel data...")
@@ -183,4 +1751,6 @@ if __name__ == '__main__':
             db.session.bulk_save_objects(initial_hostels)
             db.session.commit()
             print("Initial hostel data added.")
+    notification_worker.start() # Deliver queued notifications in the background
+    hold_scheduler.start() # Expire bed holds as they come due
     app.run(debug=True) # debug=True enables auto-reload and useful error messages
\ No newline at end of file
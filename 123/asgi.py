@@ -0,0 +1,309 @@
+# HostelBookingApp/asgi.py
+# Async deployment of the JSON API: the /api/bookings and /api/hostels contract of app.py,
+# served over ASGI with SQLAlchemy's AsyncSession on aiosqlite, so one worker keeps serving
+# other requests while a request waits on the database or SQLite's write lock. Models,
+# validation, the response cache, admission control and the notification outbox are
+# shared with app.py, and responses are byte-for-byte the same, so the frontend works
+# against either. The rest of the API (holds, exports, analytics, the live stream and
+# metrics) is served by app.py only.
+#
+#   pip install starlette aiosqlite greenlet uvicorn
+#   uvicorn asgi:app --workers 4
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from sqlalchemy import and_, delete, event, make_url, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import json
+
+import app as wsgi
+from app import (BedInventory, Booking, CacheVersion, Hostel, IdempotencyKey, Notification, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                 booked_beds, booking_notifications, clean_booking, decode_cursor, encode_cursor)
+
+config = wsgi.app.config
+
+def _engine(read_only, pool_size, max_overflow):
+    options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    engine = create_async_engine(
+        make_url(config['SQLALCHEMY_DATABASE_URI']).set(drivername='sqlite+aiosqlite'),
+        poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+        pool_timeout=options['pool_timeout'], connect_args=options['connect_args'])
+    if config['SQLITE_TUNING']:
+        event.listen(engine.sync_engine, 'connect', wsgi._sqlite_pragmas(read_only))
+    return engine
+
+# Same pools as app.py: a writer, and with SQLITE_TUNING a larger query_only pool for reads
+writer = _engine(False, config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], config['SQLALCHEMY_ENGINE_OPTIONS']['max_overflow'])
+reader = _engine(True, config['SQLALCHEMY_BINDS']['read']['pool_size'], config['SQLALCHEMY_BINDS']['read']['max_overflow']) \
+    if 'read' in config.get('SQLALCHEMY_BINDS', {}) else writer
+WriteSession = async_sessionmaker(writer, expire_on_commit=False)
+# This worker's share of WRITE_CONCURRENCY, as app.write_slots is for a WSGI worker
+write_slots = asyncio.Semaphore(config['WRITE_CONCURRENCY']) if config['WRITE_CONCURRENCY'] > 0 else None
+ReadSession = async_sessionmaker(reader, expire_on_commit=False)
+
+
+class FlaskJSONResponse(JSONResponse):
+    """JSON encoded the way Flask's jsonify() does it outside debug mode."""
+
+    def render(self, content):
+        return (json.dumps(content, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+def error(message, status_code, headers=None, **extra):
+    return FlaskJSONResponse({"error": message, **extra}, status_code=status_code, headers=headers)
+
+def too_many_requests(retry_after, reason):
+    wsgi.admission_rejections.inc(reason)
+    return error("Too many booking requests, please try again later", 429, headers={'Retry-After': str(retry_after)},
+                 retry_after=retry_after)
+
+def _best_accept(header):
+    """The media type a client prefers most in an Accept header, like Werkzeug's accept_mimetypes.best."""
+    best, best_quality = None, 0.0
+    for item in header.split(','):
+        media_type, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                with contextlib.suppress(ValueError):
+                    quality = float(param[2:])
+        if media_type and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+# --- Bookings ---
+# Async counterparts of reserve_beds(), beds_available() and the idempotency helpers in
+# app.py, taking the session explicitly instead of using Flask-SQLAlchemy's db.session.
+
+async def reserve_beds(session, hostel, checkin_date, num_beds):
+    take = (
+        update(BedInventory)
+        .where(BedInventory.hostel_id == hostel.id,
+               BedInventory.date == checkin_date,
+               BedInventory.booked + num_beds <= BedInventory.capacity)
+        .values(booked=BedInventory.booked + num_beds)
+        .execution_options(synchronize_session=False)
+    )
+    if (await session.execute(take)).rowcount == 1:
+        return True
+    if await session.get(BedInventory, (hostel.id, checkin_date)) is not None:
+        return False
+    await session.execute(
+        sqlite_insert(BedInventory)
+        .values(hostel_id=hostel.id, date=checkin_date, capacity=hostel.total_beds,
+                booked=booked_beds(hostel.id, checkin_date).scalar_subquery())
+        .on_conflict_do_nothing()
+    )
+    return (await session.execute(take)).rowcount == 1
+
+async def beds_available(session, hostel, checkin_date):
+    inventory = await session.get(BedInventory, (hostel.id, checkin_date))
+    if inventory:
+        return inventory.capacity - inventory.booked
+    return hostel.total_beds - await session.scalar(booked_beds(hostel.id, checkin_date))
+
+async def find_idempotent_booking(session, key, request_hash):
+    record = await session.get(IdempotencyKey, key)
+    if record is None or record.expires_at < datetime.datetime.utcnow():
+        return None
+    if record.request_hash != request_hash:
+        raise ValueError("Idempotency key was already used for a different booking")
+    return record.booking_id
+
+async def claim_idempotency_key(session, key, request_hash, booking_id):
+    now = datetime.datetime.utcnow()
+    await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+    values = {'key': key, 'request_hash': request_hash, 'booking_id': booking_id,
+              'expires_at': now + datetime.timedelta(seconds=config['IDEMPOTENCY_TTL'])}
+    result = await session.execute(sqlite_insert(IdempotencyKey).values(values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+def booking_created(booking_id, replayed=False):
+    response = FlaskJSONResponse({"message": "Booking created successfully!", "booking_id": booking_id}, status_code=201)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+async def create_booking(request):
+    if request.headers.get('content-type', '').split(';')[0].strip() != 'application/json':
+        return error("Request body must be JSON", 415)
+    try:
+        data = json.loads(await request.body())
+    except ValueError:
+        return error("Request body is not valid JSON", 400)
+    if not data:
+        return error("No data provided", 400)
+    # Some servers and test transports give no client address; those requests share one bucket
+    client_ip = request.client.host if request.client else 'unknown'
+    wait = wsgi.rate_limit_wait(client_ip, data.get('user_email') if isinstance(data, dict) else None)
+    if wait:
+        return too_many_requests(wait, 'rate_limit')
+
+    key = request.headers.get('Idempotency-Key')
+    request_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    async with WriteSession() as session:
+        if key:
+            if len(key) > 255:
+                return error("Idempotency-Key must be at most 255 characters", 400)
+            try:
+                booking_id = await find_idempotent_booking(session, key, request_hash)
+            except ValueError as e:
+                return error(str(e), 422)
+            if booking_id:
+                return booking_created(booking_id, replayed=True)
+
+        try:
+            fields = clean_booking(data)
+        except ValueError as e:
+            return error(str(e), 400)
+        checkin_date, num_beds = fields['checkin_date'], fields['num_beds']
+
+        hostel = await session.get(Hostel, fields['hostel_id'])
+        if not hostel:
+            return error(f"Hostel {data['hostel_id']} not found", 404)
+
+        new_booking = Booking(**fields)
+        # As in app.py, at most WRITE_CONCURRENCY bookings wait on SQLite's write lock at once;
+        # the rest queue here, off the busy handler, and one that waits longer than
+        # WRITE_QUEUE_TIMEOUT is shed. A slot granted just as the timeout cancels the wait is
+        # handed back by Semaphore.acquire(), so none can leak.
+        if write_slots:
+            try:
+                async with asyncio.timeout(config['WRITE_QUEUE_TIMEOUT']):
+                    await write_slots.acquire()
+            except TimeoutError:
+                return too_many_requests(wsgi.write_retry_after(), 'write_queue')
+        try:
+            if not await reserve_beds(session, hostel, checkin_date, num_beds):
+                # Read before rolling back: rollback expires hostel, and async sessions cannot lazy-load
+                available = await beds_available(session, hostel, checkin_date)
+                await session.rollback()
+                return error("Not enough beds available", 409, available=available)
+            session.add(new_booking)
+            # Delivered by app.notification_worker, which the after_commit hook in app.py wakes
+            session.add_all([Notification(booking=new_booking, **values)
+                             for values in booking_notifications(hostel, new_booking)])
+            if key:
+                await session.flush()
+                if not await claim_idempotency_key(session, key, request_hash, new_booking.id):
+                    await session.rollback()
+                    return booking_created(await find_idempotent_booking(session, key, request_hash), replayed=True)
+            await session.commit()
+            return booking_created(new_booking.id)
+        except ValueError as e:
+            await session.rollback()
+            return error(str(e), 422)
+        except Exception as e:
+            await session.rollback()
+            print(f"Error creating booking: {e}")
+            return error("Internal server error", 500, details=str(e))
+        finally:
+            if write_slots:
+                write_slots.release()
+
+async def get_bookings(request):
+    args = request.query_params
+    query = select(Booking).order_by(Booking.timestamp.desc(), Booking.id.desc())
+    try:
+        if args.get('hostel_id'):
+            query = query.where(Booking.hostel_id == int(args['hostel_id']))
+        if args.get('from'):
+            query = query.where(Booking.checkin_date >= datetime.date.fromisoformat(args['from']))
+        if args.get('to'):
+            query = query.where(Booking.checkin_date <= datetime.date.fromisoformat(args['to']))
+        if args.get('email'):
+            query = query.where(Booking.user_email == args['email'])
+        if args.get('cursor'):
+            timestamp, booking_id = decode_cursor(args['cursor'])
+            query = query.where(or_(Booking.timestamp < timestamp,
+                                    and_(Booking.timestamp == timestamp, Booking.id < booking_id)))
+    except ValueError:
+        return error("Invalid hostel_id, from, to or cursor parameter", 400)
+    try:
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError:
+        limit = None # Werkzeug's type=int ignores values it cannot convert
+    if limit is not None and limit < 1:
+        return error("limit must be a positive integer", 400)
+
+    if args.get('format') == 'ndjson' or _best_accept(request.headers.get('accept', '')) == 'application/x-ndjson':
+        if limit:
+            query = query.limit(limit)
+        async def generate():
+            async with ReadSession() as session:
+                async for booking in await session.stream_scalars(query.execution_options(yield_per=500)):
+                    yield json.dumps(booking.to_dict()) + '\n'
+        return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    async with ReadSession() as session:
+        bookings = (await session.scalars(query.limit(limit + 1))).all()
+    response = FlaskJSONResponse([booking.to_dict() for booking in bookings[:limit]])
+    if len(bookings) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(bookings[limit - 1])
+    return response
+
+# --- Hostels ---
+
+async def get_hostels(request):
+    # Shares app.response_cache, tagged with the same trigger-maintained cache_version
+    key = f'{request.url.path}?{request.url.query}'
+    async with ReadSession() as session:
+        version = await session.scalar(select(CacheVersion.version).where(CacheVersion.id == 1))
+        cached = wsgi.response_cache.get(key, version)
+        if cached is None:
+            hostels = (await session.scalars(select(Hostel))).all()
+            body = FlaskJSONResponse([{
+                'id': hostel.id,
+                'name': hostel.name,
+                'address': hostel.address,
+                'price': hostel.price,
+                'rating': hostel.rating,
+                'owner': {
+                    'name': hostel.owner_name,
+                    'phone': hostel.owner_phone,
+                    'email': hostel.owner_email
+                }
+            } for hostel in hostels]).body
+            cached = (body, 'application/json', hashlib.sha1(body).hexdigest())
+            wsgi.response_cache.set(key, cached, version)
+    body, mimetype, etag = cached
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=mimetype, headers=headers)
+
+async def home(request):
+    return HTMLResponse("Hostel Booking Backend is running! Access /api/bookings for data.")
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    with wsgi.app.app_context():
+        wsgi.db.create_all()
+        wsgi.upgrade_schema()
+    wsgi.notification_worker.start() # Sends in its own threads; requests never wait on SMTP
+    yield
+    wsgi.notification_worker.stop()
+    await writer.dispose()
+    await reader.dispose()
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/api/bookings', create_booking, methods=['POST']),
+        Route('/api/bookings', get_bookings, methods=['GET']),
+        Route('/api/hostels', get_hostels, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
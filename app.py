@@ -1,31 +1,150 @@
 # HostelBookingApp/app.py
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, Response, jsonify, g
+from flask import has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.message import EmailMessage
+import bisect
+import click
 import datetime
+import functools
+import hashlib
+import heapq
+import io
+import json
+import math
+import os
+import random
+import re
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
 
 # --- 1. Initialize Flask App ---
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_super_secret_key_here' # Needed for flash messages
 
 # --- 2. Database Configuration ---
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bookings.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bookings.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connection pool for the writer; `timeout` makes concurrent bookings queue on SQLite's
+# write lock instead of failing fast
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': 30,
+    'connect_args': {'timeout': 30},
+}
+# SQLite tuning; SQLITE_TUNING=0 keeps SQLite's defaults and a single pool
+app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',   # Readers stop blocking behind the writer, and vice versa
+    'synchronous': 'NORMAL', # Durable with WAL; fsync at checkpoints rather than every commit
+    'busy_timeout': 30000,   # ms to wait for the write lock
+    'mmap_size': 268435456,  # Read up to 256 MB of the file through the OS page cache
+    'cache_size': -16000,    # ~16 MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+if app.config['SQLITE_TUNING']:
+    # Views marked @read_only get their own, larger pool of query_only connections
+    app.config['SQLALCHEMY_BINDS'] = {'read': {
+        **app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+        'url': app.config['SQLALCHEMY_DATABASE_URI'],
+        'pool_size': int(os.environ.get('DB_READ_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_READ_MAX_OVERFLOW', 20)),
+    }}
+# Rendered hostel pages: how many to keep and for how many seconds
+app.config['RESPONSE_CACHE_SIZE'] = 256
+app.config['RESPONSE_CACHE_TTL'] = 300
+# How long a booking form's token is remembered, in seconds
+app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+# Bed holds: default and longest lifetime, in seconds
+app.config['HOLD_TTL'] = int(os.environ.get('HOLD_TTL', 10 * 60))
+app.config['HOLD_MAX_TTL'] = int(os.environ.get('HOLD_MAX_TTL', 30 * 60))
+# Outgoing mail for booking notifications (leave SMTP_HOST empty to print them instead)
+app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', '')
+app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 25))
+app.config['SMTP_USER'] = os.environ.get('SMTP_USER', '')
+app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD', '')
+app.config['MAIL_FROM'] = os.environ.get('MAIL_FROM', 'bookings@hostelsbooking.local')
+# Statements slower than this are logged along with the view that ran them
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+# Admission control for booking writes: per-client token buckets (0 per minute turns them
+# off), optionally kept in a SQLite file shared by worker processes, and a cap on concurrent
+# write requests (0 for none) with how long a request may wait for a slot, in seconds
+app.config['RATE_LIMIT_PER_MINUTE'] = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 10))
+app.config['RATE_LIMIT_BURST'] = int(os.environ.get('RATE_LIMIT_BURST', 5))
+app.config['RATE_LIMIT_DB'] = os.environ.get('RATE_LIMIT_DB', '')
+app.config['WRITE_CONCURRENCY'] = int(os.environ.get('WRITE_CONCURRENCY', 8))
+app.config['WRITE_QUEUE_TIMEOUT'] = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 2))
+# Photo derivatives: width of each size, output formats (best first) and encoder quality
+app.config['IMAGE_SIZES'] = {'thumb': 480, 'large': 1600}
+app.config['IMAGE_FORMATS'] = ['avif', 'webp']
+app.config['IMAGE_QUALITY'] = {'avif': 55, 'webp': 80}
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', os.cpu_count() or 1))
 
-db = SQLAlchemy(app)
+class RoutingSession(FlaskSession):
+    """Session that sends queries from @read_only views to the 'read' engine.
+
+    Flushes always go to the writer, so a read-only view that does write still works.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and 'read' in self._db.engines and g.get('read_only'):
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+def _sqlite_pragmas(read_only):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in app.config['SQLITE_PRAGMAS'].items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+    return on_connect
+
+if app.config['SQLITE_TUNING']:
+    with app.app_context():
+        event.listen(db.engines[None], 'connect', _sqlite_pragmas(read_only=False))
+        event.listen(db.engines['read'], 'connect', _sqlite_pragmas(read_only=True))
+
+def read_only(view):
+    """Run a view's queries on the read pool, off the writer's connections."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
 
 # --- 3. Database Models ---
 
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    hostel_id = db.Column(db.Integer, nullable=False)
+    hostel_id = db.Column(db.Integer, db.ForeignKey('hostel.id'), nullable=False)
     hostel_name = db.Column(db.String(100), nullable=False)
-    checkin_date = db.Column(db.String(10), nullable=False) # Store as YYYY-MM-DD string
+    checkin_date = db.Column(db.Date, nullable=False)
     num_beds = db.Column(db.Integer, nullable=False)
     user_name = db.Column(db.String(100), nullable=False)
     user_email = db.Column(db.String(100), nullable=False)
     user_phone = db.Column(db.String(20), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_booking_hostel_checkin', 'hostel_id', 'checkin_date'), # Per-hostel date-range lookups
+    )
 
     def __repr__(self):
         return f'<Booking {self.hostel_name} on {self.checkin_date} for {self.num_beds} beds by {self.user_name}>'
@@ -39,6 +158,7 @@ class Hostel(db.Model):
     owner_name = db.Column(db.String(100), nullable=False)
     owner_phone = db.Column(db.String(20), nullable=False)
     owner_email = db.Column(db.String(100), nullable=False)
+    total_beds = db.Column(db.Integer, nullable=False, default=50, server_default='50') # Beds available per night
 #in a large app thesr might be seperate tables or more complex structrue ina a
     # In a larger app, these might be separate tables or more complex structures
     images_json = db.Column(db.Text, nullable=True) # Store as JSON string
@@ -47,36 +167,1357 @@ class Hostel(db.Model):
     timings_json = db.Column(db.Text, nullable=True)
     reviews_json = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_hostel_rating_price', 'rating', 'price'), # Covers search ordering and facet counts
+    )
+
     def __repr__(self):
         return f'<Hostel {self.name} by {self.owner_name}>'
 
-    # Helper methods to convert JSON strings back to Python objects
-    def get_images(self):
-        import json
-        return json.loads(self.images_json) if self.images_json else []
+    # Helper methods to convert JSON strings back to Python objects.
+    # Results are shared between requests, so treat them as read-only.
+    def get_images(self, size='large', fmt='webp'):
+        # Derived copies where `flask build-images` has made them, otherwise the originals
+        images = decode_json(self.images_json) if self.images_json else []
+        return [(image_variant(url, size) or {}).get(fmt, url) for url in images]
+    def get_image_sets(self, size='large'):
+        # For <picture>: each original with its AVIF/WebP URLs and size, if it has been derived
+        images = decode_json(self.images_json) if self.images_json else []
+        return [{'original': url, **(image_variant(url, size) or {})} for url in images]
     def get_features(self):
-        import json
-        return json.loads(self.features_json) if self.features_json else []
+        return decode_json(self.features_json) if self.features_json else []
     def get_menu(self):
-        import json
-        return json.loads(self.menu_json) if self.menu_json else {}
+        return decode_json(self.menu_json) if self.menu_json else {}
     def get_timings(self):
-        import json
-        return json.loads(self.timings_json) if self.timings_json else []
+        return decode_json(self.timings_json) if self.timings_json else []
     def get_reviews(self):
-        import json
-        return json.loads(self.reviews_json) if self.reviews_json else []
+        return decode_json(self.reviews_json) if self.reviews_json else []
+
+@functools.lru_cache(maxsize=4096)
+def decode_json(raw):
+    """Parse a *_json column value, once per distinct value.
+
+    Keyed on the text itself, so writing a new value to a column is a cache miss and
+    the old entry simply ages out. Python caches a string's hash, so repeat calls on
+    the same loaded row cost a dict lookup.
+    """
+    return json.loads(raw)
+
+class BedInventory(db.Model):
+    # One row per hostel per check-in date; `booked` only changes through reserve_beds()
+    hostel_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    capacity = db.Column(db.Integer, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<BedInventory hostel {self.hostel_id} on {self.date}: {self.booked}/{self.capacity}>'
+
+# Bookings and beds per hostel per check-in date, kept current by triggers on the booking table
+class OccupancyDaily(db.Model):
+    hostel_id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    beds = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OccupancyDaily hostel {self.hostel_id} on {self.date}: {self.beds} beds>'
+
+# Beds set aside while a guest fills in the booking form; given back if not confirmed in time
+class BedHold(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), nullable=False, unique=True, default=lambda: uuid.uuid4().hex)
+    hostel_id = db.Column(db.Integer, db.ForeignKey('hostel.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    num_beds = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='held') # held, confirmed, released or expired
+    expires_at = db.Column(db.DateTime, nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    booking = db.relationship('Booking')
+
+    __table_args__ = (
+        db.Index('ix_bed_hold_due', 'status', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<BedHold {self.token}: {self.num_beds} beds at hostel {self.hostel_id} on {self.date}, {self.status}>'
+
+    def to_dict(self):
+        return {
+            'token': self.token,
+            'hostel_id': self.hostel_id,
+            'checkin_date': self.date.isoformat(),
+            'num_beds': self.num_beds,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat(),
+        }
+
+# Bookings already made under a client's Idempotency-Key (or the booking form's hidden token)
+class IdempotencyKey(db.Model):
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False) # SHA-256 of the request that used the key
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} -> booking {self.booking_id}>'
+
+# Outbox of notifications to send; rows are written in the same transaction as the booking
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
+    recipient = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending') # pending, sending, sent or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    booking = db.relationship('Booking')
+
+    __table_args__ = (
+        db.Index('ix_notification_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<Notification {self.id} to {self.recipient}: {self.status}>'
+
+# A single row whose version triggers bump on every hostel write, from any process or raw SQL
+class CacheVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True) # Always 1
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.version}>'
+
+# --- 4. Bed Inventory ---
+
+def reserve_beds(hostel, checkin_date, num_beds):
+    """Take num_beds from hostel's inventory for checkin_date inside the current transaction.
+
+    The decrement is a single conditional UPDATE, so two writers can never both see the
+    same free beds: SQLite holds its write lock from this statement until commit.
+    Returns True if the beds were reserved, False if there is not enough room.
+    """
+    take = (
+        db.update(BedInventory)
+        .where(BedInventory.hostel_id == hostel.id,
+               BedInventory.date == checkin_date,
+               BedInventory.booked + num_beds <= BedInventory.capacity)
+        .values(booked=BedInventory.booked + num_beds)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(take).rowcount == 1:
+        return True
+    if db.session.get(BedInventory, (hostel.id, checkin_date)) is not None:
+        return False # Not enough room
+    # First booking for the night: create its inventory row from the hostel's capacity, counting
+    # the beds booked before the row existed (a database upgraded from before bed_inventory, or
+    # a raw load). This is the only place the booking table is summed, once per night.
+    db.session.execute(
+        sqlite_insert(BedInventory)
+        .values(hostel_id=hostel.id, date=checkin_date, capacity=hostel.total_beds,
+                booked=booked_beds(hostel.id, checkin_date).scalar_subquery())
+        .on_conflict_do_nothing()
+    )
+    return db.session.execute(take).rowcount == 1
+
+def beds_available(hostel, checkin_date):
+    inventory = db.session.get(BedInventory, (hostel.id, checkin_date))
+    if inventory:
+        return inventory.capacity - inventory.booked
+    return hostel.total_beds - db.session.scalar(booked_beds(hostel.id, checkin_date))
+
+def booked_beds(hostel_id, checkin_date):
+    """SELECT of the beds booked at hostel_id for checkin_date, counted from the booking table."""
+    return (db.select(db.func.coalesce(db.func.sum(Booking.num_beds), 0))
+            .where(Booking.hostel_id == hostel_id, Booking.checkin_date == checkin_date))
+
+BOOKING_COLUMNS = 'id, hostel_id, hostel_name, checkin_date, num_beds, user_name, user_email, user_phone, timestamp'
+
+def upgrade_schema():
+    """Bring a bookings.db created by an older version of the app up to date, in place.
+
+    Every step checks whether it is still needed, so this is safe to run on every start.
+    Raises RuntimeError, with nothing changed, if the existing rows cannot be carried over.
+    """
+    with db.engine.connect() as conn:
+        # One write transaction for the whole upgrade: either all of it lands or none of it
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+        hostel_columns = {row[1] for row in conn.exec_driver_sql('PRAGMA table_info(hostel)')}
+        if 'total_beds' not in hostel_columns:
+            conn.exec_driver_sql('ALTER TABLE hostel ADD COLUMN total_beds INTEGER NOT NULL DEFAULT 50')
+
+        # checkin_date used to be VARCHAR(10). SQLite cannot change a column's type, so the
+        # table is rebuilt with the current definition and the rows are copied across.
+        booking_columns = {row[1]: row[2] for row in conn.exec_driver_sql('PRAGMA table_info(booking)')}
+        orphans = []
+        if booking_columns.get('checkin_date', 'DATE').upper() != 'DATE':
+            # The old table had no foreign keys, so bookings may name a hostel that was since
+            # deleted. The new table cannot hold them; set them aside in orphaned_booking.
+            orphans = conn.exec_driver_sql(
+                'SELECT booking.id, booking.hostel_id FROM booking '
+                'LEFT JOIN hostel ON hostel.id = booking.hostel_id WHERE hostel.id IS NULL').all()
+            if orphans:
+                conn.exec_driver_sql('CREATE TABLE IF NOT EXISTS orphaned_booking AS SELECT * FROM booking WHERE 0')
+                conn.exec_driver_sql('INSERT INTO orphaned_booking SELECT booking.* FROM booking '
+                                     'LEFT JOIN hostel ON hostel.id = booking.hostel_id WHERE hostel.id IS NULL')
+                conn.exec_driver_sql('DELETE FROM booking WHERE hostel_id NOT IN (SELECT id FROM hostel)')
+            # A DATE column only reads back YYYY-MM-DD, so stop rather than copy anything else.
+            # date() also rolls impossible days over ('2026-02-30' -> '2026-03-02'); refuse those too.
+            unreadable = conn.exec_driver_sql(
+                'SELECT id, checkin_date FROM booking '
+                'WHERE date(checkin_date) IS NULL OR date(checkin_date) != substr(checkin_date, 1, 10)').all()
+            if unreadable:
+                raise RuntimeError(f"{len(unreadable)} booking(s) have a check-in date that is not YYYY-MM-DD; "
+                                   f"correct them and upgrade again: "
+                                   + ', '.join(f'#{id} {date!r}' for id, date in unreadable[:20]))
+            # SQLite's recipe for changing a table: build the new one under another name, then
+            # drop the old one and rename. Renaming the old table out of the way instead would
+            # repoint the foreign keys of notification, bed_hold, etc. at it before it is dropped.
+            for index in Booking.__table__.indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS {index.name}')
+            create_table = str(CreateTable(Booking.__table__).compile(conn))
+            conn.exec_driver_sql(create_table.replace('CREATE TABLE booking ', 'CREATE TABLE booking_new ', 1))
+            conn.exec_driver_sql(
+                f'INSERT INTO booking_new ({BOOKING_COLUMNS}) '
+                f'SELECT {BOOKING_COLUMNS.replace("checkin_date", "date(checkin_date)")} FROM booking')
+            conn.exec_driver_sql('DROP TABLE booking')
+            conn.exec_driver_sql('ALTER TABLE booking_new RENAME TO booking')
+            # The occupancy triggers were dropped with the old table; recreate them and recount
+            for statement in OCCUPANCY_TRIGGERS + OCCUPANCY_REBUILD:
+                conn.exec_driver_sql(statement)
+            # Tables pointing at booking must still find their rows in the rebuilt table
+            broken = [row for table in db.metadata.sorted_tables
+                      if any(key.column.table is Booking.__table__ for key in table.foreign_keys)
+                      for row in conn.exec_driver_sql(f'PRAGMA foreign_key_check({table.name})') if row[2] == 'booking']
+            if broken:
+                raise RuntimeError(f"{len(broken)} row(s) would point at missing bookings after the rebuild, e.g. "
+                                   + ', '.join(f'{table} row {rowid}' for table, rowid, _, _ in broken[:20]))
+
+        for index in (*Booking.__table__.indexes, *Hostel.__table__.indexes):
+            index.create(conn, checkfirst=True)
+        conn.commit()
+    if orphans:
+        app.logger.warning('Moved %d booking(s) for hostels that no longer exist to orphaned_booking: %s',
+                           len(orphans), ', '.join(f'#{id} (hostel {hostel_id})' for id, hostel_id in orphans[:20]))
+    db.session.execute(db.text('ANALYZE'))  # Refresh planner statistics for the new indexes
+    db.session.commit()
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Upgrade the bookings database schema in place."""
+    db.create_all()
+    try:
+        upgrade_schema()
+    except RuntimeError as e:
+        raise SystemExit(f"Upgrade aborted, nothing was changed: {e}")
+    print("Database schema is up to date.")
+
+# --- 5. Idempotency Keys ---
+# A retried or double-submitted booking carries the same key as the original. The key is
+# recorded in the same transaction as the booking it created, so the booking and its key
+# commit together or not at all, and a replay gets that booking back instead of a new one.
+
+def find_idempotent_booking(key, request_hash):
+    """Return the id of the booking already created under key, or None.
+
+    Raises ValueError if the key was used for a different request.
+    """
+    record = db.session.get(IdempotencyKey, key)
+    if record is None or record.expires_at < datetime.datetime.utcnow():
+        return None
+    if record.request_hash != request_hash:
+        raise ValueError("Idempotency key was already used for a different booking")
+    return record.booking_id
+
+def claim_idempotency_key(key, request_hash, booking_id):
+    """Record key as having created booking_id, inside the current transaction.
+
+    Only an expired record can be overwritten, so when two requests with the same key race,
+    the one that commits second gets False and should roll back and replay the first.
+    Also purges expired keys, which keeps the table bounded by IDEMPOTENCY_TTL.
+    """
+    now = datetime.datetime.utcnow()
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+    values = {'key': key, 'request_hash': request_hash, 'booking_id': booking_id,
+              'expires_at': now + datetime.timedelta(seconds=app.config['IDEMPOTENCY_TTL'])}
+    result = db.session.execute(sqlite_insert(IdempotencyKey).values(values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+
+# --- 6. Occupancy Rollups ---
+# occupancy_daily is a materialized count of bookings and beds per (hostel_id, date). SQLite
+# triggers adjust one row on every booking insert, update or delete, including bulk inserts
+# that bypass the ORM, so analytics read a few hundred rollup rows however long the booking
+# history grows. create_all() backfills it the first time; `flask rebuild-occupancy` redoes that.
+
+def _count_booking(row, sign):
+    return (f"INSERT INTO occupancy_daily (hostel_id, date, bookings, beds) "
+            f"VALUES ({row}.hostel_id, {row}.checkin_date, {sign}1, {sign}{row}.num_beds) "
+            f"ON CONFLICT (hostel_id, date) DO UPDATE SET bookings = bookings + excluded.bookings, beds = beds + excluded.beds; "
+            f"DELETE FROM occupancy_daily WHERE hostel_id = {row}.hostel_id AND date = {row}.checkin_date AND bookings = 0;")
+
+OCCUPANCY_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_insert AFTER INSERT ON booking BEGIN {_count_booking('new', '+')} END",
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_update AFTER UPDATE OF hostel_id, checkin_date, num_beds ON booking "
+    f"BEGIN {_count_booking('old', '-')} {_count_booking('new', '+')} END",
+    f"CREATE TRIGGER IF NOT EXISTS booking_occupancy_delete AFTER DELETE ON booking BEGIN {_count_booking('old', '-')} END",
+]
+OCCUPANCY_REBUILD = [
+    "DELETE FROM occupancy_daily",
+    "INSERT INTO occupancy_daily (hostel_id, date, bookings, beds) "
+    "SELECT hostel_id, checkin_date, COUNT(*), SUM(num_beds) FROM booking GROUP BY hostel_id, checkin_date",
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_occupancy_rollup(target, connection, **kw):
+    for statement in OCCUPANCY_TRIGGERS:
+        connection.exec_driver_sql(statement)
+    if connection.exec_driver_sql('SELECT NOT EXISTS (SELECT 1 FROM occupancy_daily)').scalar():
+        for statement in OCCUPANCY_REBUILD:
+            connection.exec_driver_sql(statement)
+
+@app.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Recount occupancy_daily from the booking table, e.g. after a raw backfill."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE') # Block booking writes while recounting
+        for statement in OCCUPANCY_TRIGGERS + OCCUPANCY_REBUILD:
+            conn.exec_driver_sql(statement)
+        conn.commit()
+    print("Occupancy rollup rebuilt.")
+
+# Bucket start for each analytics period, as SQL over occupancy_daily.date
+OCCUPANCY_PERIODS = {
+    'day': "date",
+    'week': "date(date, '-6 days', 'weekday 1')", # Monday on or before the date
+    'month': "strftime('%Y-%m-01', date)",
+}
+MAX_OCCUPANCY_DAYS = 731
+
+def _period_start(period, day):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+def _next_period(period, start):
+    if period == 'week':
+        return start + datetime.timedelta(days=7)
+    if period == 'month':
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+def hostel_occupancy(hostel, period, start, end):
+    """Bookings, beds, occupancy rate and revenue estimate per period between start and end.
+
+    Revenue is estimated as beds booked times the hostel's current listed price. Periods
+    with no bookings are included with zeros.
+    """
+    bucket = db.literal_column(OCCUPANCY_PERIODS[period])
+    counts = {date_text: (bookings, beds) for date_text, bookings, beds in db.session.execute(
+        db.select(bucket, db.func.sum(OccupancyDaily.bookings), db.func.sum(OccupancyDaily.beds))
+        .where(OccupancyDaily.hostel_id == hostel.id, OccupancyDaily.date.between(start, end))
+        .group_by(bucket))}
+
+    def summary(bookings, beds, days):
+        return {'bookings': bookings, 'beds': beds,
+                'occupancy_rate': round(beds / (hostel.total_beds * days), 4) if hostel.total_beds else None,
+                'revenue_estimate': beds * hostel.price if hostel.price is not None else None}
+
+    series = []
+    period_start = _period_start(period, start)
+    while period_start <= end:
+        period_end = _next_period(period, period_start) - datetime.timedelta(days=1)
+        days = (min(period_end, end) - max(period_start, start)).days + 1 # Only the part inside the range
+        bookings, beds = counts.get(period_start.isoformat(), (0, 0))
+        series.append({'start': period_start.isoformat(), **summary(bookings, beds, days)})
+        period_start = _next_period(period, period_start)
+    totals = summary(sum(row['bookings'] for row in series), sum(row['beds'] for row in series), (end - start).days + 1)
+    return series, totals
+
+# --- 7. Bed Holds ---
+# A hold takes beds from the inventory like a booking does, for a limited time. Confirming
+# it turns those beds into a booking; releasing it, or letting it expire, gives them back.
+
+def place_hold(hostel, checkin_date, num_beds, ttl):
+    """Hold num_beds at hostel for checkin_date for ttl seconds and commit.
+
+    Returns the new BedHold, or None if there are not enough free beds.
+    """
+    if not reserve_beds(hostel, checkin_date, num_beds):
+        db.session.rollback()
+        return None
+    hold = BedHold(hostel_id=hostel.id, date=checkin_date, num_beds=num_beds,
+                   expires_at=hold_scheduler.clock() + datetime.timedelta(seconds=ttl))
+    db.session.add(hold)
+    db.session.commit()
+    hold_scheduler.schedule(hold.id, hold.expires_at)
+    return hold
+
+def claim_hold(token, hostel_id, checkin_date, num_beds):
+    """Mark a live hold for exactly these beds as confirmed, inside the current transaction.
+
+    The caller attaches the booking and commits; the hold's beds become the booking's.
+    Returns the BedHold, or None if the hold is unknown, used up, expired or for other beds.
+    """
+    return db.session.execute(
+        db.update(BedHold)
+        .where(BedHold.token == token, BedHold.status == 'held', BedHold.expires_at > hold_scheduler.clock(),
+               BedHold.hostel_id == hostel_id, BedHold.date == checkin_date, BedHold.num_beds == num_beds)
+        .values(status='confirmed')
+        .returning(BedHold)
+    ).scalar_one_or_none()
+
+def _return_beds(holds):
+    """Give the beds of (hostel_id, date, num_beds) rows back to the inventory."""
+    totals = {}
+    for hostel_id, date, num_beds in holds:
+        totals[hostel_id, date] = totals.get((hostel_id, date), 0) + num_beds
+    for (hostel_id, date), num_beds in totals.items():
+        db.session.execute(
+            db.update(BedInventory)
+            .where(BedInventory.hostel_id == hostel_id, BedInventory.date == date)
+            .values(booked=BedInventory.booked - num_beds))
+
+def release_hold(token):
+    """Give a live hold's beds back and commit. Returns False if the hold was not live."""
+    released = db.session.execute(
+        db.update(BedHold)
+        .where(BedHold.token == token, BedHold.status == 'held')
+        .values(status='released')
+        .returning(BedHold.hostel_id, BedHold.date, BedHold.num_beds)
+    ).all()
+    _return_beds(released)
+    db.session.commit()
+    return bool(released)
+
+class HoldScheduler:
+    """Expires bed holds at their deadlines, driven by a min-heap of (expires_at, hold id).
+
+    The thread only ever waits for the earliest deadline, so thousands of holds cost one
+    timer rather than a poll of the table. The heap decides when to wake, not what to
+    expire: each run expires every due hold with one UPDATE on ix_bed_hold_due, so holds
+    that were confirmed or released are simply skipped, and holds placed by another process
+    are caught within sweep_interval. Holds live in the database, and start() reloads the
+    ones still pending. Processes that only place holds, such as web workers while
+    `flask hold-scheduler` runs elsewhere, keep no heap at all.
+    Replace `clock` to run it on simulated time.
+    """
+
+    def __init__(self, clock=datetime.datetime.utcnow, sweep_interval=60.0):
+        self.clock = clock
+        self.sweep_interval = sweep_interval
+        self._heap = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._running = False # Set once run() is expiring holds in this process
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='hold-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def load(self):
+        """Schedule every hold still pending in the database, e.g. after a restart."""
+        for hold_id, expires_at in db.session.execute(
+                db.select(BedHold.id, BedHold.expires_at).where(BedHold.status == 'held')):
+            self.schedule(hold_id, expires_at)
+
+    def schedule(self, hold_id, expires_at):
+        if not self._running:
+            return # Nothing here would ever pop it; the running scheduler's sweep finds the hold
+        with self._lock:
+            heapq.heappush(self._heap, (expires_at, hold_id))
+            earliest = self._heap[0] == (expires_at, hold_id)
+        if earliest:
+            self._wake.set() # The thread may be sleeping towards a later deadline
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """Expire every hold past its deadline, give its beds back and commit. Returns how many expired."""
+        now = self.clock()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+        expired = db.session.execute(
+            db.update(BedHold)
+            .where(BedHold.status == 'held', BedHold.expires_at <= now)
+            .values(status='expired')
+            .returning(BedHold.hostel_id, BedHold.date, BedHold.num_beds)
+        ).all()
+        _return_beds(expired)
+        db.session.commit()
+        return len(expired)
+
+    def run(self):
+        self._running = True
+        with app.app_context():
+            self.load()
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    self.run_due()
+            except Exception as e: # Keep the scheduler alive; the holds are retried on the next run
+                print(f"Hold scheduler error: {e}")
+            deadline = self.next_deadline()
+            timeout = self.sweep_interval
+            if deadline is not None:
+                timeout = min(timeout, max((deadline - self.clock()).total_seconds(), 0))
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+hold_scheduler = HoldScheduler()
+
+@app.cli.command('hold-scheduler')
+def hold_scheduler_command():
+    """Expire bed holds as they come due until interrupted."""
+    hold_scheduler.run()
+
+# --- 8. Response Cache ---
+# Hostel data changes rarely, so rendered hostel pages are kept in memory and revalidated
+# by ETag. Entries are tagged with cache_version, which triggers bump on any write to hostel,
+# whether through the ORM, raw SQL or another worker process, and with the mtime of the
+# image manifest that `flask build-images` replaces. Each cached request reads both (one
+# primary-key lookup and a stat) and ignores entries rendered under older ones.
+
+class ResponseCache:
+    """Bounded LRU of rendered responses with a time-to-live, shared by all request threads."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """The value stored for key under version, or None if it is missing, expired or older."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, entry_version, value = entry
+            if expires < time.monotonic() or entry_version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+
+def cache_version():
+    """Versions of the hostel data and image manifest that cached pages are rendered from."""
+    try:
+        manifest = os.stat(IMAGE_MANIFEST).st_mtime_ns
+    except FileNotFoundError:
+        manifest = None
+    # On the read pool, like the @read_only views it fronts, so a 304 never takes a writer connection
+    with db.engines.get('read', db.engine).connect() as conn:
+        return conn.scalar(db.select(CacheVersion.version).where(CacheVersion.id == 1)), manifest
+
+def cached_response(view):
+    """Serve a view from response_cache, answering If-None-Match with 304 Not Modified."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages are rendered into the page, so it must not be cached
+        if session.get('_flashes'):
+            return view(*args, **kwargs)
+        key = request.full_path
+        # Read before rendering, so an entry never holds rows older than its version
+        version = cache_version()
+        cached = response_cache.get(key, version)
+        if cached is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+            response_cache.set(key, cached, version)
+        body, mimetype, etag = cached
+        response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True # Browsers may keep it but must revalidate
+        return response.make_conditional(request)
+    return wrapper
+
+CACHE_VERSION_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS hostel_cache_{action} AFTER {action.upper()} ON hostel BEGIN "
+    f"UPDATE cache_version SET version = version + 1 WHERE id = 1; END"
+    for action in ('insert', 'update', 'delete')
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_cache_version(target, connection, **kw):
+    connection.exec_driver_sql('INSERT OR IGNORE INTO cache_version (id, version) VALUES (1, 0)')
+    for statement in CACHE_VERSION_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+# --- 9. Notification Outbox ---
+# Booking handlers only insert Notification rows; NotificationWorker delivers them in the
+# background, so a slow or unreachable mail server never adds to a booking's latency.
+# Without SMTP_HOST set, notifications are printed to the console instead of emailed.
+# To try real delivery locally: python -m aiosmtpd -n -l localhost:8025 and SMTP_HOST=localhost SMTP_PORT=8025
+
+def queue_booking_notifications(hostel, booking):
+    """Add the owner and guest emails for a new booking to the current transaction."""
+    checkin = booking.checkin_date.isoformat()
+    db.session.add_all([
+        Notification(
+            booking=booking,
+            recipient=hostel.owner_email,
+            subject=f"New Booking for {hostel.name} by {booking.user_name}",
+            body=f"Details: {booking.num_beds} beds on {checkin}. User: {booking.user_name} {booking.user_email} {booking.user_phone}."
+        ),
+        Notification(
+            booking=booking,
+            recipient=booking.user_email,
+            subject=f"Your Booking Confirmation for {hostel.name}",
+            body=f"Hi {booking.user_name},\nYour booking for {booking.num_beds} beds at {hostel.name} on {checkin} is confirmed."
+        ),
+    ])
+
+def send_notification(recipient, subject, body):
+    if not app.config['SMTP_HOST']:
+        print(f"\n--- NOTIFICATION to {recipient} ---\n{subject}\n{body}\n-----------------------------------\n")
+        return
+    message = EmailMessage()
+    message['From'] = app.config['MAIL_FROM']
+    message['To'] = recipient
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(app.config['SMTP_HOST'], app.config['SMTP_PORT'], timeout=30) as smtp:
+        if app.config['SMTP_USER']:
+            smtp.starttls()
+            smtp.login(app.config['SMTP_USER'], app.config['SMTP_PASSWORD'])
+        smtp.send_message(message)
+
+class NotificationWorker:
+    """Drains the notification outbox in batches, retrying failures with exponential backoff.
+
+    Batches are claimed with a single UPDATE ... RETURNING, so several workers (or processes)
+    can drain the same table without sending anything twice. Rows left in 'sending' by a
+    crashed worker are picked up again once their claim is older than claim_timeout.
+    """
+
+    def __init__(self, batch_size=50, pool_size=8, poll_interval=5.0, max_attempts=6,
+                 backoff=datetime.timedelta(seconds=30), max_backoff=datetime.timedelta(hours=1), claim_timeout=datetime.timedelta(minutes=5)):
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='notification-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        with ThreadPoolExecutor(self.pool_size, thread_name_prefix='notify') as pool:
+            while not self._stop.is_set():
+                try:
+                    with app.app_context():
+                        delivered = self.drain_batch(pool)
+                except Exception as e: # Keep the worker alive; the batch is retried after claim_timeout
+                    print(f"Notification worker error: {e}")
+                    delivered = 0
+                if not delivered:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+
+    def drain_batch(self, pool):
+        """Claim one batch, deliver it on the pool and record the outcomes. Returns the batch size."""
+        now = datetime.datetime.utcnow()
+        due = (db.select(Notification.id)
+               .where(db.or_(db.and_(Notification.status == 'pending', Notification.next_attempt_at <= now),
+                             db.and_(Notification.status == 'sending', Notification.claimed_at < now - self.claim_timeout)))
+               .order_by(Notification.id)
+               .limit(self.batch_size))
+        claimed = db.session.execute(
+            db.update(Notification)
+            .where(Notification.id.in_(due.scalar_subquery()))
+            .values(status='sending', claimed_at=now)
+            .returning(Notification.id, Notification.recipient, Notification.subject, Notification.body, Notification.attempts)
+        ).all()
+        db.session.commit()
+        if not claimed:
+            return 0
 
+        def deliver(row):
+            try:
+                send_notification(row.recipient, row.subject, row.body)
+                return row, None
+            except Exception as e:
+                return row, str(e)
 
-# --- 4. Routes (Page Rendering and Form Handling) ---
+        now = datetime.datetime.utcnow()
+        for row, error in pool.map(deliver, claimed):
+            if error is None:
+                values = {'status': 'sent', 'attempts': row.attempts + 1, 'last_error': None}
+            elif row.attempts + 1 >= self.max_attempts:
+                values = {'status': 'failed', 'attempts': row.attempts + 1, 'last_error': error}
+            else:
+                delay = min(self.backoff * 2 ** row.attempts, self.max_backoff) * random.uniform(0.8, 1.2)
+                values = {'status': 'pending', 'attempts': row.attempts + 1, 'last_error': error,
+                          'next_attempt_at': now + delay}
+            db.session.execute(db.update(Notification).where(Notification.id == row.id).values(**values))
+        db.session.commit()
+        return len(claimed)
+
+notification_worker = NotificationWorker()
+
+@event.listens_for(Session, 'before_flush')
+def _note_new_notifications(session, flush_context, instances):
+    if any(isinstance(obj, Notification) for obj in session.new):
+        session.info['notifications_queued'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _wake_notification_worker(session):
+    if session.info.pop('notifications_queued', False):
+        notification_worker.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_new_notifications(session):
+    session.info.pop('notifications_queued', None)
+
+@app.cli.command('notification-worker')
+def notification_worker_command():
+    """Deliver queued notifications until interrupted."""
+    notification_worker.run()
+
+# --- 10. Hostel Search ---
+# hostel_fts is an FTS5 index over each hostel's name, address, feature texts, menu and
+# review texts, and hostel_feature lists each hostel's feature icons for filtering and
+# facet counts. SQLite triggers keep both in step with every write to the hostel table,
+# including ones that bypass the ORM, and create_all() backfills rows that predate them.
+
+def _json_text(column, path=None):
+    """SQL that joins the values (or one field of each item) of a JSON column into one string."""
+    value = f"json_extract(value, '{path}')" if path else 'value'
+    return (f"(SELECT group_concat({value}, ' ') FROM json_each("
+            f"CASE WHEN json_valid({column}) THEN {column} END))")
+
+def _search_columns(row):
+    return (f"{row}.name, {row}.address, {_json_text(row + '.features_json', '$.text')}, "
+            f"{_json_text(row + '.menu_json')}, {_json_text(row + '.reviews_json', '$.text')}")
+
+def _feature_icons(row):
+    # In a trigger `row` is new/old; otherwise it names the hostel table to read from
+    source = '' if row in ('new', 'old') else f'{row}, '
+    return (f"SELECT {row}.id, json_extract(value, '$.icon') FROM {source}json_each("
+            f"CASE WHEN json_valid({row}.features_json) THEN {row}.features_json END) "
+            f"WHERE json_extract(value, '$.icon') IS NOT NULL")
+
+def _index_hostel(row):
+    return (f"INSERT INTO hostel_fts(rowid, name, address, features, menu, reviews) VALUES ({row}.id, {_search_columns(row)}); "
+            f"INSERT OR IGNORE INTO hostel_feature (hostel_id, icon) {_feature_icons(row)};")
+
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hostel_fts USING fts5("
+    "name, address, features, menu, reviews, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TABLE IF NOT EXISTS hostel_feature ("
+    "hostel_id INTEGER NOT NULL, icon TEXT NOT NULL, PRIMARY KEY (icon, hostel_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_hostel_feature_hostel ON hostel_feature (hostel_id)",
+    f"CREATE TRIGGER IF NOT EXISTS hostel_search_insert AFTER INSERT ON hostel BEGIN {_index_hostel('new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS hostel_search_update AFTER UPDATE ON hostel BEGIN "
+    f"DELETE FROM hostel_fts WHERE rowid = old.id; DELETE FROM hostel_feature WHERE hostel_id = old.id; "
+    f"{_index_hostel('new')} END",
+    "CREATE TRIGGER IF NOT EXISTS hostel_search_delete AFTER DELETE ON hostel BEGIN "
+    "DELETE FROM hostel_fts WHERE rowid = old.id; DELETE FROM hostel_feature WHERE hostel_id = old.id; END",
+    # Backfill hostels written before the index existed (features first: both check hostel_fts)
+    f"INSERT OR IGNORE INTO hostel_feature (hostel_id, icon) {_feature_icons('hostel')} "
+    f"AND hostel.id NOT IN (SELECT rowid FROM hostel_fts)",
+    f"INSERT INTO hostel_fts(rowid, name, address, features, menu, reviews) "
+    f"SELECT hostel.id, {_search_columns('hostel')} FROM hostel WHERE hostel.id NOT IN (SELECT rowid FROM hostel_fts)",
+]
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+# Column weights for bm25(): a match in the name counts most, menu and reviews least
+SEARCH_RANK = 'bm25(hostel_fts, 10.0, 5.0, 3.0, 1.0, 1.0)'
+PRICE_BANDS = [(None, 5000), (5000, 6000), (6000, 7000), (7000, None)]
+RATING_THRESHOLDS = [4.5, 4.0, 3.5, 3.0]
+
+def _price_band_label(low, high):
+    if low is None:
+        return f'under {high}'
+    return f'{low}+' if high is None else f'{low}-{high}'
+
+def search_hostels(text='', min_price=None, max_price=None, min_rating=None, icons=(), limit=20, offset=0):
+    """Rank hostels matching free text and filters, and count facets over the full match set.
+
+    Returns (hostels, total, facets). Words in text are matched as prefixes and all must
+    appear; with no text, hostels are ordered by rating.
+    """
+    words = re.findall(r'\w+', text or '')
+    conditions, params = [], {}
+    if words:
+        source = 'hostel_fts JOIN hostel ON hostel.id = hostel_fts.rowid'
+        conditions.append('hostel_fts MATCH :match')
+        # Quote each word so user input can never be parsed as FTS5 query syntax
+        params['match'] = ' '.join(f'"{word}"*' for word in words)
+        order = SEARCH_RANK
+    else:
+        source = 'hostel'
+        order = 'hostel.rating DESC, hostel.id'
+    if min_price is not None:
+        conditions.append('hostel.price >= :min_price')
+        params['min_price'] = min_price
+    if max_price is not None:
+        conditions.append('hostel.price <= :max_price')
+        params['max_price'] = max_price
+    if min_rating is not None:
+        conditions.append('hostel.rating >= :min_rating')
+        params['min_rating'] = min_rating
+    for i, icon in enumerate(icons):
+        # A range scan of hostel_feature's (icon, hostel_id) key, not a probe per hostel
+        conditions.append(f'hostel.id IN (SELECT hostel_id FROM hostel_feature WHERE icon = :icon{i})')
+        params[f'icon{i}'] = icon
+    where = ' AND '.join(conditions) or '1'
+
+    ids = db.session.scalars(db.text(f'SELECT hostel.id FROM {source} WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :offset'),
+                             {**params, 'limit': limit, 'offset': offset}).all()
+    by_id = {hostel.id: hostel for hostel in db.session.scalars(db.select(Hostel).where(Hostel.id.in_(ids)))}
+    hostels = [by_id[hostel_id] for hostel_id in ids]
+
+    # Total, price bands and rating thresholds in one pass over the matches, icons in a second
+    price_sums = [
+        'SUM(' + ' AND '.join(filter(None, ['hostel.price IS NOT NULL',
+                                            low is not None and f'hostel.price >= {low}',
+                                            high is not None and f'hostel.price < {high}'])) + ')'
+        for low, high in PRICE_BANDS]
+    rating_sums = [f'SUM(hostel.rating >= {threshold})' for threshold in RATING_THRESHOLDS]
+    summary = db.session.execute(db.text(
+        f"SELECT COUNT(*), {', '.join(price_sums + rating_sums)} FROM {source} WHERE {where}"), params).one()
+    if conditions:
+        icon_query = (f'SELECT f.icon, COUNT(*) AS hostels FROM {source} JOIN hostel_feature f ON f.hostel_id = hostel.id '
+                      f'WHERE {where} GROUP BY f.icon ORDER BY hostels DESC, f.icon')
+    else: # Every hostel matches, so the feature table can be counted on its own
+        icon_query = 'SELECT icon, COUNT(*) AS hostels FROM hostel_feature GROUP BY icon ORDER BY hostels DESC, icon'
+    icon_counts = db.session.execute(db.text(icon_query), params).all()
+
+    total, counts = summary[0], [count or 0 for count in summary[1:]]
+    facets = {
+        'price': [{'band': _price_band_label(low, high), 'count': count}
+                  for (low, high), count in zip(PRICE_BANDS, counts)],
+        'rating': [{'min': threshold, 'count': count}
+                   for threshold, count in zip(RATING_THRESHOLDS, counts[len(PRICE_BANDS):])],
+        'features': [{'icon': icon, 'count': count} for icon, count in icon_counts],
+    }
+    return hostels, total, facets
+
+def search_args():
+    """Read search_hostels() keyword arguments from the query string."""
+    return dict(
+        text=request.args.get('q', ''),
+        min_price=request.args.get('min_price', type=float),
+        max_price=request.args.get('max_price', type=float),
+        min_rating=request.args.get('min_rating', type=float),
+        icons=request.args.getlist('feature'),
+        limit=min(max(request.args.get('limit', 20, type=int), 1), 100), # SQLite reads LIMIT -1 as no limit
+        offset=max(request.args.get('offset', 0, type=int), 0),
+    )
+
+# --- 11. Image Derivatives ---
+# `flask build-images` turns every photo under static/photos into resized AVIF and WebP
+# copies in static/derived, named after a hash of their bytes so browsers and CDNs may keep
+# them forever. manifest.json maps each original URL to its copies; Hostel.get_images()
+# resolves through it and falls back to the original for photos not processed yet.
+
+PHOTOS_DIR = os.path.join(app.static_folder, 'photos')
+DERIVED_DIR = os.path.join(app.static_folder, 'derived')
+IMAGE_MANIFEST = os.path.join(DERIVED_DIR, 'manifest.json')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif')
+DERIVED_NAME = re.compile(r'.+\.[0-9a-f]{16}\.[a-z]+') # <stem>.<size>.<content hash>.<format>
+
+_image_manifest = (None, {}) # (manifest file mtime, images), swapped as a whole on reload
+
+def _write_atomic(path, data):
+    """Write bytes to path so that readers see either the old file or the whole new one."""
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+def _image_settings():
+    """Everything that shapes the output; a change rebuilds every photo."""
+    return {'sizes': app.config['IMAGE_SIZES'], 'formats': app.config['IMAGE_FORMATS'],
+            'quality': app.config['IMAGE_QUALITY']}
+
+def _render_derivatives(source, stem, settings):
+    """Hash one photo and write each size and format of it into DERIVED_DIR.
+
+    Runs in a worker process, so it takes and returns plain data.
+    """
+    from PIL import Image, ImageOps
+    with open(source, 'rb') as f:
+        data = f.read()
+    variants = {}
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original) # Phone photos are often stored sideways
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        for size, width in settings['sizes'].items():
+            resized = image.copy()
+            resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS) # Only ever shrinks
+            variant = {'width': resized.width, 'height': resized.height}
+            for fmt in settings['formats']:
+                buffer = io.BytesIO()
+                resized.save(buffer, fmt.upper(), quality=settings['quality'][fmt])
+                encoded = buffer.getvalue()
+                name = f'{stem}.{size}.{hashlib.sha256(encoded).hexdigest()[:16]}.{fmt}'
+                if not os.path.exists(os.path.join(DERIVED_DIR, name)):
+                    _write_atomic(os.path.join(DERIVED_DIR, name), encoded)
+                variant[fmt] = name
+            variants[size] = variant
+    return hashlib.sha256(data).hexdigest(), variants
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _is_current(entry, source, stat):
+    """Whether a manifest entry still describes the photo at source and all its files exist."""
+    if not entry or not all(os.path.exists(os.path.join(DERIVED_DIR, variant[fmt]))
+                            for variant in entry['variants'].values() for fmt in app.config['IMAGE_FORMATS']):
+        return False
+    # Size and mtime settle almost every photo without reading it; a touched file is hashed
+    return ((entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+            or entry['sha256'] == _file_digest(source))
+
+def build_image_derivatives(workers=None, force=False, prune=False):
+    """Bring DERIVED_DIR up to date with PHOTOS_DIR and rewrite the manifest.
+
+    Photos unchanged since the last run are skipped unless force is set. Returns
+    (built, skipped, failed) counts.
+    """
+    try:
+        from PIL import features
+    except ImportError:
+        raise RuntimeError("Building image derivatives needs Pillow (pip install Pillow).") from None
+    missing = [fmt for fmt in app.config['IMAGE_FORMATS'] if not features.check(fmt)]
+    if missing:
+        raise RuntimeError(f"This Pillow build cannot write {', '.join(missing)}.")
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+    settings = _image_settings()
+    try:
+        with open(IMAGE_MANIFEST) as f:
+            previous = json.load(f)
+    except FileNotFoundError:
+        previous = {'settings': None, 'images': {}}
+    if previous['settings'] != settings:
+        force = True
+
+    images, pending, skipped = {}, {}, 0
+    for folder, _, files in os.walk(PHOTOS_DIR):
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            source = os.path.join(folder, filename)
+            relpath = os.path.relpath(source, PHOTOS_DIR).replace(os.sep, '/')
+            url = f'{app.static_url_path}/photos/{relpath}'
+            stat = os.stat(source)
+            entry = previous['images'].get(url)
+            if not force and _is_current(entry, source, stat):
+                images[url] = {**entry, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                skipped += 1
+            else:
+                stem = re.sub(r'[^A-Za-z0-9_-]+', '-', os.path.splitext(relpath)[0])
+                pending[url] = (source, stem, stat)
+
+    failed = 0
+    if pending:
+        # Encoding is CPU-bound, so photos are spread over processes rather than threads
+        with ProcessPoolExecutor(max_workers=workers or app.config['IMAGE_WORKERS']) as pool:
+            futures = {url: pool.submit(_render_derivatives, source, stem, settings)
+                       for url, (source, stem, _) in pending.items()}
+            for url, future in futures.items():
+                try:
+                    digest, variants = future.result()
+                except Exception as exc:
+                    print(f"Could not process {url}: {exc}")
+                    failed += 1
+                    if url in previous['images']:
+                        images[url] = previous['images'][url] # Keep serving the last good copies
+                    continue
+                stat = pending[url][2]
+                images[url] = {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                               'variants': variants}
+    _write_atomic(IMAGE_MANIFEST, json.dumps({'settings': settings, 'images': images}, indent=1).encode())
+
+    if prune:
+        # Only safe once no cached page or CDN still points at the old names
+        keep = {variant[fmt] for entry in images.values() for variant in entry['variants'].values()
+                for fmt in settings['formats']}
+        for filename in os.listdir(DERIVED_DIR):
+            if DERIVED_NAME.fullmatch(filename) and filename not in keep:
+                os.remove(os.path.join(DERIVED_DIR, filename))
+    return len(pending) - failed, skipped, failed
+
+def image_manifest():
+    """The manifest's images by original URL, re-read whenever build-images replaces it."""
+    global _image_manifest
+    try:
+        mtime = os.stat(IMAGE_MANIFEST).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if mtime != _image_manifest[0]:
+        with open(IMAGE_MANIFEST) as f:
+            _image_manifest = (mtime, json.load(f)['images'])
+    return _image_manifest[1]
+
+def image_variant(url, size):
+    """Size, AVIF and WebP URLs of one derivative of a photo, or None if it has none yet."""
+    entry = image_manifest().get(url)
+    variant = entry and entry['variants'].get(size)
+    if not variant:
+        return None
+    return {key: f'{app.static_url_path}/derived/{value}' if key in app.config['IMAGE_FORMATS'] else value
+            for key, value in variant.items()}
+
+@app.after_request
+def _cache_derived_images(response):
+    # A derived file's name changes with its content, so it never needs revalidating
+    if (request.endpoint == 'static' and response.status_code in (200, 206, 304)
+            and DERIVED_NAME.fullmatch(request.path.rsplit('/', 1)[-1])):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.cli.command('build-images')
+@click.option('--workers', type=int, help='Worker processes (default IMAGE_WORKERS).')
+@click.option('--force', is_flag=True, help='Rebuild photos that have not changed.')
+@click.option('--prune', is_flag=True, help='Delete derived files the manifest no longer uses.')
+def build_images_command(workers, force, prune):
+    """Resize static/photos into content-hashed AVIF and WebP files."""
+    try:
+        built, skipped, failed = build_image_derivatives(workers, force, prune)
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    print(f"Image derivatives: {built} built, {skipped} unchanged, {failed} failed.")
+
+# --- 12. Request Metrics ---
+# Prometheus-style metrics kept in process memory and served as text on /metrics. An
+# observation is a bisect plus a short locked update, cheap enough to leave on in production.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class Counter:
+    """Monotonic counter per combination of label values."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f'{self.name}{_label_text(self.labels, label_values)} {value}' for label_values, value in values]
+        return lines
+
+class Histogram:
+    """Bucketed distribution per combination of label values."""
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name, self.help_text, self.buckets, self.labels = name, help_text, buckets, labels
+        self._series = {} # label values -> [count per bucket..., count above the last bucket, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value) # Buckets are upper bounds, inclusive
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = sorted((label_values, list(series)) for label_values, series in self._series.items())
+        for label_values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), label_values + (bound,))} {cumulative}")
+            labels = _label_text(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {series[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+request_latency = Histogram('http_request_duration_seconds', 'Time to produce a response, by view.',
+                            LATENCY_BUCKETS, ('endpoint', 'method'))
+request_count = Counter('http_requests_total', 'Responses by view and status code.', ('endpoint', 'method', 'status'))
+request_queries = Histogram('http_request_db_queries', 'SQL statements executed per request, by view.',
+                            QUERY_COUNT_BUCKETS, ('endpoint',))
+request_db_time = Histogram('http_request_db_seconds', 'Time spent in SQL per request, by view.',
+                            LATENCY_BUCKETS, ('endpoint',))
+query_count = Counter('db_queries_total', 'SQL statements executed, including background work.')
+query_time = Counter('db_query_seconds_total', 'Time spent executing SQL statements.')
+slow_query_count = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS, by view.', ('endpoint',))
+template_render_time = Histogram('template_render_seconds', 'Time to render each Jinja template.',
+                                LATENCY_BUCKETS, ('template',))
+METRICS = [request_latency, request_count, request_queries, request_db_time, query_count, query_time,
+           slow_query_count, template_render_time]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    query_count.inc()
+    query_time.inc(amount=elapsed)
+    endpoint = None
+    if has_request_context():
+        endpoint = request.endpoint
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0) + elapsed
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        slow_query_count.inc(endpoint or '-')
+        app.logger.warning('Slow query (%.0f ms) in %s: %s', elapsed * 1000, endpoint or 'background work', statement)
+
+def _forget_failed_query(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get('query_started'):
+        exception_context.connection.info['query_started'].pop()
+
+with app.app_context():
+    for engine in db.engines.values():
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _forget_failed_query)
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    # Streamed bodies are still being produced at this point; their time is not included
+    if 'request_started' in g:
+        endpoint = request.endpoint or '<unmatched>'
+        request_latency.observe(time.perf_counter() - g.request_started, endpoint, request.method)
+        request_count.inc(endpoint, request.method, response.status_code)
+        request_queries.observe(g.get('db_queries', 0), endpoint)
+        request_db_time.observe(g.get('db_seconds', 0), endpoint)
+    return response
+
+@before_render_template.connect_via(app)
+def _start_render_timer(sender, template, context, **extra):
+    g.setdefault('render_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _record_render_time(sender, template, context, **extra):
+    template_render_time.observe(time.perf_counter() - g.render_started.pop(), template.name)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+# --- 13. Admission Control ---
+# Every booking write ends up queueing on SQLite's single writer, so during a rush writes are
+# rationed before they get there. Each client IP and guest email has a token bucket, and at
+# most WRITE_CONCURRENCY write requests run at once while the rest wait up to
+# WRITE_QUEUE_TIMEOUT for a slot. Refusals are 429 with Retry-After. Buckets live in this
+# process, or with RATE_LIMIT_DB in a small SQLite file that all workers on the host share.
+
+class TokenBuckets:
+    """In-memory token buckets keyed by client, kept in least-recently-used order.
+
+    A bucket left alone for burst / rate seconds has refilled, which is the same as having
+    no bucket, so idle ones are dropped from the old end as requests arrive. Memory is one
+    small entry per client seen within that window.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.idle = burst / rate
+        self._buckets = OrderedDict() # key -> (tokens, last request time)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend a token from key's bucket. Returns 0 if there was one, else seconds until there is."""
+        now = time.monotonic()
+        with self._lock:
+            while self._buckets:
+                oldest, (_, updated) = next(iter(self._buckets.items()))
+                if now - updated < self.idle:
+                    break
+                del self._buckets[oldest]
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - allowed, now)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+class SqliteTokenBuckets:
+    """Token buckets in a SQLite file, so every worker process on the host draws on the same ones.
+
+    A take() is one UPSERT ... RETURNING on a per-thread connection. Nothing in the file is
+    worth an fsync, so it runs with synchronous=OFF. If the file cannot be used, requests
+    are let through rather than refused.
+    """
+
+    # SET expressions all see the row as it was, so the refill is spelled out in each
+    _REFILLED = "MIN(:burst, tokens + (:now - updated) * :rate)"
+    TAKE = (f"INSERT INTO token_bucket (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1) "
+            f"ON CONFLICT (key) DO UPDATE SET tokens = {_REFILLED} - ({_REFILLED} >= 1), "
+            f"allowed = {_REFILLED} >= 1, updated = :now RETURNING tokens, allowed")
+
+    def __init__(self, path, rate, burst):
+        self.path, self.rate, self.burst = path, rate, burst
+        self.idle = burst / rate
+        self._local = threading.local()
+        self._purged = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS token_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                         'updated REAL NOT NULL, allowed INTEGER NOT NULL) WITHOUT ROWID')
+        return conn
+
+    def take(self, key):
+        now = time.time() # Wall clock: the rows are compared across processes
+        try:
+            conn = self._connection()
+            if now - self._purged > self.idle:
+                self._purged = now
+                conn.execute('DELETE FROM token_bucket WHERE updated < ?', (now - self.idle,))
+            tokens, allowed = conn.execute(self.TAKE, {'key': key, 'now': now, 'rate': self.rate,
+                                                      'burst': self.burst}).fetchone()
+        except sqlite3.Error as e:
+            app.logger.warning('Rate limit store unavailable, letting request through: %s', e)
+            return 0
+        return 0 if allowed else (1 - tokens) / self.rate
+
+if app.config['RATE_LIMIT_PER_MINUTE'] <= 0:
+    rate_limiter = None
+elif app.config['RATE_LIMIT_DB']:
+    rate_limiter = SqliteTokenBuckets(app.config['RATE_LIMIT_DB'], app.config['RATE_LIMIT_PER_MINUTE'] / 60,
+                                      app.config['RATE_LIMIT_BURST'])
+else:
+    rate_limiter = TokenBuckets(app.config['RATE_LIMIT_PER_MINUTE'] / 60, app.config['RATE_LIMIT_BURST'])
+write_slots = threading.BoundedSemaphore(app.config['WRITE_CONCURRENCY']) if app.config['WRITE_CONCURRENCY'] > 0 else None
+
+admission_rejections = Counter('admission_rejected_total', 'Write requests refused with 429, by reason.', ('reason',))
+METRICS.append(admission_rejections)
+
+def rate_limit_wait(client_ip, email=None):
+    """Seconds until this client may write again (0 if it may now), spending a token if so."""
+    if rate_limiter is None:
+        return 0
+    wait = rate_limiter.take(f'ip:{client_ip}')
+    if not wait and isinstance(email, str) and email.strip():
+        wait = rate_limiter.take(f'email:{email.strip().lower()}')
+    return math.ceil(wait)
+
+def write_retry_after():
+    # Spread the retries of a shed burst instead of sending them all back at once
+    return math.ceil(app.config['WRITE_QUEUE_TIMEOUT'] * random.uniform(1, 2))
+
+def too_many_requests(retry_after, reason):
+    admission_rejections.inc(reason)
+    if request.path.startswith('/api/'):
+        response = jsonify({"error": "Too many booking requests, please try again later", "retry_after": retry_after})
+    else:
+        response = make_response(f"Too many booking attempts. Please try again in {retry_after} seconds.")
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def admission_controlled(view):
+    """Rate-limit a write view per client IP and guest email, then run it under the write cap.
+
+    GET requests pass straight through, so a form page can share its route with its POST.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+        data = request.get_json(silent=True) if request.is_json else request.form
+        wait = rate_limit_wait(request.remote_addr, data.get('user_email') if isinstance(data, Mapping) else None)
+        if wait:
+            return too_many_requests(wait, 'rate_limit')
+        if write_slots is None:
+            return view(*args, **kwargs)
+        if not write_slots.acquire(timeout=app.config['WRITE_QUEUE_TIMEOUT']):
+            return too_many_requests(write_retry_after(), 'write_queue')
+        try:
+            return view(*args, **kwargs)
+        finally:
+            write_slots.release()
+    return wrapper
+
+# --- 14. Routes (Page Rendering and Form Handling) ---
 
 @app.route('/')
+@cached_response
+@read_only
 def index():
     # Fetch all hostels to display on the home page
     all_hostels = Hostel.query.all()
     return render_template('index.html', hostels=all_hostels)
 
 @app.route('/hostel/<int:hostel_id>')
+@cached_response
+@read_only
 def hostel_detail(hostel_id):
     hostel = db.session.get(Hostel, hostel_id) # Safer way to get by PK
     if not hostel:
@@ -84,15 +1525,148 @@ def hostel_detail(hostel_id):
         return redirect(url_for('index'))
     return render_template('hostel_detail.html', hostel=hostel)
 
+@app.route('/search')
+@cached_response
+@read_only
+def search():
+    # Same cards as the home page, filtered and ranked; ?q=wifi&min_rating=4&feature=gym
+    hostels, total, facets = search_hostels(**search_args())
+    return render_template('index.html', hostels=hostels, total=total, facets=facets, query=request.args.get('q', ''))
+
+@app.route('/api/search')
+@cached_response
+@read_only
+def search_api():
+    hostels, total, facets = search_hostels(**search_args())
+    return jsonify({
+        'total': total,
+        'facets': facets,
+        'results': [{
+            'id': hostel.id,
+            'name': hostel.name,
+            'address': hostel.address,
+            'price': hostel.price,
+            'rating': hostel.rating,
+            'image': next(iter(hostel.get_images('thumb')), None),
+            'features': hostel.get_features(),
+        } for hostel in hostels],
+    })
+
+
+@app.route('/api/hostels/<int:hostel_id>/occupancy', methods=['GET'])
+@read_only
+def get_hostel_occupancy(hostel_id):
+    # Owner dashboard: ?period=day|week|month&from=2026-07-01&to=2026-09-30 (default: the next 30 days)
+    hostel = db.session.get(Hostel, hostel_id)
+    if not hostel:
+        return jsonify({"error": f"Hostel {hostel_id} not found"}), 404
+    period = request.args.get('period', 'day')
+    try:
+        start = datetime.date.fromisoformat(request.args['from']) if request.args.get('from') else datetime.date.today()
+        end = datetime.date.fromisoformat(request.args['to']) if request.args.get('to') else start + datetime.timedelta(days=29)
+    except ValueError:
+        return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+    if period not in OCCUPANCY_PERIODS or not 0 <= (end - start).days < MAX_OCCUPANCY_DAYS:
+        return jsonify({"error": f"period must be day, week or month, and from..to at most {MAX_OCCUPANCY_DAYS} days"}), 400
+
+    series, totals = hostel_occupancy(hostel, period, start, end)
+    return jsonify({'hostel_id': hostel.id, 'period': period, 'from': start.isoformat(), 'to': end.isoformat(),
+                    'total_beds': hostel.total_beds, 'price': hostel.price, 'totals': totals, 'series': series})
+
+def _json_int(value):
+    # int() would quietly book 1 bed for 1.9 or true; a JSON count must be a whole number already
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{value!r} is not an integer")
+    return value
+
+@app.route('/api/holds', methods=['POST'])
+@admission_controlled
+def create_hold():
+    # Hold beds while the guest fills in their details: {"hostel_id", "checkin_date", "num_beds", "ttl" (seconds, optional)}
+    data = request.get_json(silent=True) or {}
+    try:
+        hostel_id = int(data['hostel_id'])
+        checkin_date = datetime.date.fromisoformat(data['checkin_date'])
+        num_beds = _json_int(data['num_beds'])
+        ttl = int(data.get('ttl', app.config['HOLD_TTL']))
+        if num_beds <= 0 or not 0 < ttl <= app.config['HOLD_MAX_TTL']:
+            raise ValueError
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "hostel_id, checkin_date (YYYY-MM-DD) and a positive num_beds are required, "
+                                 f"and ttl must be 1-{app.config['HOLD_MAX_TTL']} seconds"}), 400
+
+    hostel = db.session.get(Hostel, hostel_id)
+    if not hostel:
+        return jsonify({"error": f"Hostel {hostel_id} not found"}), 404
+    hold = place_hold(hostel, checkin_date, num_beds, ttl)
+    if hold is None:
+        return jsonify({"error": "Not enough beds available", "available": beds_available(hostel, checkin_date)}), 409
+    return jsonify(hold.to_dict()), 201
+
+@app.route('/api/holds/<token>/confirm', methods=['POST'])
+@admission_controlled
+def confirm_hold(token):
+    # Book the held beds: {"user_name", "user_email", "user_phone"}
+    data = request.get_json(silent=True) or {}
+    hold = db.session.scalar(db.select(BedHold).where(BedHold.token == token))
+    if not hold:
+        return jsonify({"error": "Hold not found"}), 404
+    missing = [field for field in ('user_name', 'user_email', 'user_phone') if not data.get(field)]
+    if missing:
+        return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
+
+    hostel = db.session.get(Hostel, hold.hostel_id)
+    try:
+        hold = claim_hold(token, hold.hostel_id, hold.date, hold.num_beds)
+        if not hold:
+            db.session.rollback()
+            return jsonify({"error": "Hold has expired or was already confirmed or released"}), 410
+        new_booking = Booking(hostel_id=hostel.id, hostel_name=hostel.name, checkin_date=hold.date, num_beds=hold.num_beds,
+                              user_name=data['user_name'], user_email=data['user_email'], user_phone=data['user_phone'])
+        db.session.add(new_booking)
+        hold.booking = new_booking
+        queue_booking_notifications(hostel, new_booking) # Sent by notification_worker after commit
+        db.session.commit()
+        return jsonify({"message": "Booking created successfully!", "booking_id": new_booking.id}), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error confirming hold: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+@app.route('/api/holds/<token>', methods=['DELETE'])
+def delete_hold(token):
+    if not release_hold(token):
+        return jsonify({"error": "Hold not found or no longer active"}), 404
+    return jsonify({"message": "Hold released"})
 
 @app.route('/book/<int:hostel_id>', methods=['GET', 'POST'])
+@admission_controlled
 def book_bed(hostel_id):
     hostel = db.session.get(Hostel, hostel_id)
     if not hostel:
         flash('Hostel not found!')
         return redirect(url_for('index'))
 
+    # Each rendered form carries a one-time token in a hidden `idempotency_token` field, so a
+    # double-submitted or re-posted form returns the booking it already made
+    token = request.form.get('idempotency_token') or request.headers.get('Idempotency-Key') or uuid.uuid4().hex
+    def booking_form():
+        return render_template('booking_form.html', hostel=hostel, current_date=datetime.date.today().isoformat(),
+                               idempotency_token=token)
+
     if request.method == 'POST':
+        fields = sorted((name, value) for name, value in request.form.items() if name != 'idempotency_token')
+        request_hash = hashlib.sha256(json.dumps([hostel_id, fields]).encode()).hexdigest()
+        try:
+            booking_id = find_idempotent_booking(token, request_hash) if len(token) <= 255 else None
+        except ValueError:
+            flash('This form was already used for a different booking. Please check the details and submit again.')
+            token = uuid.uuid4().hex
+            return booking_form()
+        if booking_id:
+            flash('Booking confirmed successfully!')
+            return redirect(url_for('booking_confirmation', booking_id=booking_id))
+
         # Process the booking form submission
         user_name = request.form.get('user_name')
         user_email = request.form.get('user_email')
@@ -103,7 +1677,7 @@ def book_bed(hostel_id):
         # Basic validation
         if not all([user_name, user_email, user_phone, checkin_date, num_beds_str]):
             flash('Please fill in all required fields.')
-            return render_template('booking_form.html', hostel=hostel, current_date=datetime.date.today().isoformat())
+            return booking_form()
         
         try:
             num_beds = int(num_beds_str)
@@ -111,12 +1685,18 @@ def book_bed(hostel_id):
                 raise ValueError("Number of beds must be positive.")
         except ValueError:
             flash('Number of beds must be a positive integer.')
-            return render_template('booking_form.html', hostel=hostel, current_date=datetime.date.today().isoformat())
+            return booking_form()
+
+        try:
+            checkin = datetime.date.fromisoformat(checkin_date)
+        except ValueError:
+            flash('Check-in date must be in YYYY-MM-DD format.')
+            return booking_form()
 
         new_booking = Booking(
             hostel_id=hostel.id,
             hostel_name=hostel.name,
-            checkin_date=checkin_date,
+            checkin_date=checkin,
             num_beds=num_beds,
             user_name=user_name,
             user_email=user_email,
@@ -124,30 +1704,33 @@ def book_bed(hostel_id):
         )
 
         try:
+            # Beds held for this form through POST /api/holds become the booking's
+            hold = request.form.get('hold_token') and claim_hold(request.form['hold_token'], hostel.id, checkin, num_beds)
+            if not hold and not reserve_beds(hostel, checkin, num_beds):
+                db.session.rollback()
+                flash(f'Sorry, only {beds_available(hostel, checkin)} bed(s) are left for that date.')
+                return booking_form()
             db.session.add(new_booking)
+            if hold:
+                hold.booking = new_booking
+            queue_booking_notifications(hostel, new_booking) # Sent by notification_worker after commit
+            db.session.flush()
+            if len(token) <= 255 and not claim_idempotency_key(token, request_hash, new_booking.id):
+                # The same form was submitted twice at once and the other submission won
+                db.session.rollback()
+                new_booking = db.session.get(Booking, find_idempotent_booking(token, request_hash))
             db.session.commit()
             flash('Booking confirmed successfully!')
 
-            # --- Messaging Logic (Server-side Placeholder) ---
-            # This is where you'd integrate sending actual emails/SMS/WhatsApp.
-            # print statements go to your Flask console.
-            print(f"\n--- NEW BOOKING NOTIFICATION ---")
-            print(f"Hostel: {hostel.name}")
-            print(f"Check-in Date: {checkin_date}")
-            print(f"Number of Beds: {num_beds}")
-            print(f"Booked by: {user_name} ({user_email}, {user_phone})")
-            print(f"Owner: {hostel.owner_name} (Phone: {hostel.owner_phone}, Email: {hostel.owner_email})")
-            print(f"-----------------------------------\n")
-
             return redirect(url_for('booking_confirmation', booking_id=new_booking.id))
 
         except Exception as e:
             db.session.rollback()
             flash(f'An error occurred during booking: {e}')
-            return render_template('booking_form.html', hostel=hostel, current_date=datetime.date.today().isoformat())
+            return booking_form()
 
     # If GET request, just show the booking form
-    return render_template('booking_form.html', hostel=hostel, current_date=datetime.date.today().isoformat())
+    return booking_form()
 
 @app.route('/booking_confirmation/<int:booking_id>')
 def booking_confirmation(booking_id):
@@ -162,7 +1745,7 @@ def booking_confirmation(booking_id):
         return redirect(url_for('index'))
 
     # Prepare data for rendering confirmation page
-    checkin_date_formatted = datetime.datetime.strptime(booking.checkin_date, '%Y-%m-%d').strftime('%B %d, %Y')
+    checkin_date_formatted = booking.checkin_date.strftime('%B %d, %Y')
     
     # Generate Google Maps URL
     encoded_address = hostel.address.replace(' ', '+') # Simple encoding for map URL
@@ -188,10 +1771,16 @@ def booking_confirmation(booking_id):
                            whatsapp_url=whatsapp_url,
                            email_url=email_url)
 
-# --- 5. Run the Flask App ---
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- 15. Run the Flask App ---
 if __name__ == '__main__':
     with app.app_context():
         db.create_all() # Create database tables if they don't exist
+        upgrade_schema()
         # Add initial hostel data if the Hostel table is empty
         if Hostel.query.count() == 0:
             import json # Import json for storing complex data as strings
@@ -324,4 +1913,6 @@ if __name__ == '__main__':
             db.session.bulk_save_objects(initial_hostels)
             db.session.commit()
             print("Initial hostel data added.")
+    notification_worker.start() # Deliver queued notifications in the background
+    hold_scheduler.start() # Expire bed holds as they come due
     app.run(debug=True)
\ No newline at end of file
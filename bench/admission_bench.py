@@ -0,0 +1,111 @@
+# HostelBookingApp/bench/admission_bench.py
+# Simulates an enrollment rush on POST /api/bookings: a few bot addresses hammer the endpoint
+# without waiting, while guests from their own addresses book once each, honouring
+# Retry-After. Runs once with admission control off and once on, and reports how guests
+# fared. Also checks that the SQLite-backed buckets are shared: several processes spending
+# from one key get exactly one burst between them.
+#
+#   python bench/admission_bench.py --bots 8 --guests 4 --duration 10
+
+import argparse
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from common import hostel_row, load_app
+
+_sequence = itertools.count(1)
+
+
+def booking(email):
+    return {'hostel_id': 1, 'hostel_name': 'Hostel 1', 'checkin_date': '2026-07-01', 'num_beds': 1,
+            'user_name': 'Guest', 'user_email': email, 'user_phone': '9999999999'}
+
+
+def rush(mod, bots, guests, duration):
+    stop = threading.Event()
+    guest_times, guest_failures, bot_statuses = [], [], []
+
+    def bot(n):
+        client = mod.app.test_client()
+        while not stop.is_set():
+            response = client.post('/api/bookings', json=booking(f'bot{next(_sequence)}@example.com'),
+                                   environ_base={'REMOTE_ADDR': f'10.0.0.{n % 2}'})
+            bot_statuses.append(response.status_code)
+
+    def guest():
+        client = mod.app.test_client()
+        while not stop.is_set():
+            i = next(_sequence)
+            started = time.perf_counter()
+            for _ in range(5):
+                response = client.post('/api/bookings', json=booking(f'guest{i}@example.com'),
+                                       environ_base={'REMOTE_ADDR': f'192.168.{i // 256 % 256}.{i % 256}'})
+                if response.status_code != 429:
+                    break
+                time.sleep(int(response.headers['Retry-After']))
+            if response.status_code == 201:
+                guest_times.append(time.perf_counter() - started)
+            else:
+                guest_failures.append(response.status_code)
+
+    threads = [threading.Thread(target=bot, args=(n,)) for n in range(bots)]
+    threads += [threading.Thread(target=guest) for _ in range(guests)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    guest_times.sort()
+    return guest_times, guest_failures, bot_statuses
+
+
+def spend(path, key, attempts, results):
+    mod = load_app('api', os.environ['DATABASE_URL'])
+    buckets = mod.SqliteTokenBuckets(path, rate=1 / 3600, burst=5)
+    results.put(sum(buckets.take(key) == 0 for _ in range(attempts)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking rush with and without admission control")
+    parser.add_argument('--bots', type=int, default=8)
+    parser.add_argument('--guests', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='admission-')
+    for label, settings in [('admission control off', {'RATE_LIMIT_PER_MINUTE': '0', 'WRITE_CONCURRENCY': '0'}),
+                            ('admission control on', {'RATE_LIMIT_PER_MINUTE': '10', 'WRITE_CONCURRENCY': '4'})]:
+        os.environ.update(settings)
+        mod = load_app('api', 'sqlite:///' + os.path.join(folder, f"{label.split()[-1]}.db"))
+        with mod.app.app_context():
+            mod.db.session.execute(mod.db.insert(mod.Hostel), [dict(hostel_row(1), total_beds=10 ** 6)])
+            mod.db.session.commit()
+        guest_times, guest_failures, bot_statuses = rush(mod, args.bots, args.guests, args.duration)
+        accepted = bot_statuses.count(201)
+        print(f'{label}: bots sent {len(bot_statuses)}, {accepted} booked, {bot_statuses.count(429)} refused; '
+              f'guests booked {len(guest_times)}, failed {len(guest_failures)}, time to booking '
+              f'p50 {statistics.median(guest_times) * 1000:.0f} ms  max {guest_times[-1] * 1000:.0f} ms')
+
+    # Four processes, ten attempts each, one key: only the burst of five may get through
+    path = os.path.join(folder, 'buckets.db')
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=spend, args=(path, 'ip:203.0.113.7', 10, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    allowed = sum(results.get() for _ in workers)
+    print(f'shared SQLite buckets: {allowed} of 40 requests from 4 processes allowed (burst 5)')
+
+
+if __name__ == '__main__':
+    main()
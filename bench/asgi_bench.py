@@ -0,0 +1,148 @@
+# HostelBookingApp/bench/asgi_bench.py
+# Compares the JSON API served synchronously (app.py on Werkzeug's threaded server, as
+# app.run() does) with the async deployment (asgi.py on one uvicorn worker). Each server
+# runs in its own process against the same synthetic database; N keep-alive clients run
+# a mix of hostel listings, booking pages and new bookings, and requests/sec and latency
+# are reported for each concurrency level.
+#
+#   python bench/asgi_bench.py --concurrency 1 16 64 --duration 10
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import ROOT, booking_row, hostel_row, load_app
+
+API_DIR = os.path.join(ROOT, '123')
+
+
+def serve(mode, port):
+    """Run one server in this process until killed."""
+    sys.path.insert(0, API_DIR)
+    if mode == 'asgi':
+        import uvicorn
+        uvicorn.run('asgi:app', port=port, log_level='warning', access_log=False)
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        import app
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app.notification_worker.start()
+        make_server('127.0.0.1', port, app.app, threaded=True).serve_forever()
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/hostels')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit(f'server on port {port} did not start')
+
+
+def client(port, hostels, stop, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    n = 0
+    while not stop.is_set():
+        n += 1
+        roll = rng.random()
+        if roll < 0.4:
+            method, path, body = 'GET', '/api/hostels', None
+        elif roll < 0.8:
+            method, path, body = 'GET', f'/api/bookings?hostel_id={rng.randint(1, hostels)}&limit=20', None
+        else:
+            hostel_id = rng.randint(1, hostels)
+            method, path = 'POST', '/api/bookings'
+            body = json.dumps({'hostel_id': hostel_id, 'hostel_name': f'Hostel {hostel_id}',
+                               'checkin_date': f'2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', 'num_beds': 1,
+                               'user_name': 'Load', 'user_email': f'load{seed}-{n}@example.com', 'user_phone': '9999999999'})
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body, {'Content-Type': 'application/json'} if body else {})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            continue
+        latencies.append((time.perf_counter() - started, method))
+
+
+def run(port, hostels, concurrency, duration):
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(port, hostels, stop, latencies, errors, i))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    reads = sorted(latency for latency, method in latencies if method == 'GET')
+    writes = sorted(latency for latency, method in latencies if method == 'POST')
+    return (len(latencies) / duration, percentile(reads, 50), percentile(reads, 99),
+            percentile(writes, 50), percentile(writes, 99), len(errors))
+
+
+def percentile(ordered, pct):
+    return ordered[max(int(len(ordered) * pct / 100) - 1, 0)] * 1000 if ordered else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WSGI vs ASGI throughput for the JSON API")
+    parser.add_argument('--hostels', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=5100)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve, args.port)
+
+    database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='asgi-'), 'bookings.db')
+    mod = load_app('api', database_url)
+    with mod.app.app_context():
+        mod.db.session.execute(mod.db.insert(mod.Hostel),
+                               [dict(hostel_row(i), total_beds=10 ** 6) for i in range(1, args.hostels + 1)])
+        mod.db.session.execute(mod.db.insert(mod.Booking), [booking_row(i, args.hostels) for i in range(1, args.bookings + 1)])
+        mod.db.session.commit()
+        mod.db.session.execute(mod.db.text('ANALYZE'))
+
+    print(f'{args.hostels} hostels, {args.bookings} bookings; 40% GET /api/hostels, '
+          f'40% GET /api/bookings?hostel_id=, 20% POST /api/bookings')
+    for mode in ('wsgi', 'asgi'):
+        env = {**os.environ, 'DATABASE_URL': database_url}
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(args.port)],
+                                  env=env, cwd=API_DIR, stdout=subprocess.DEVNULL)
+        try:
+            wait_for(args.port)
+            for concurrency in args.concurrency:
+                rps, read_p50, read_p99, write_p50, write_p99, errors = run(
+                    args.port, args.hostels, concurrency, args.duration)
+                print(f'{mode:4} {concurrency:4} clients  {rps:6.0f} req/s  '
+                      f'GET p50 {read_p50:6.1f} p99 {read_p99:7.1f} ms  POST p50 {write_p50:6.1f} p99 {write_p99:7.1f} ms  '
+                      f'{errors} errors')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
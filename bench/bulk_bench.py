@@ -0,0 +1,65 @@
+# HostelBookingApp/bench/bulk_bench.py
+# Compares rows/sec of POST /api/bookings (one row per request) against
+# POST /api/bookings/batch for the same agency-sized workload.
+#
+#   python bench/bulk_bench.py --rows 5000 --batch 1000
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from common import load_app
+
+
+def fresh_app(hostels):
+    mod = load_app('api', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bulk-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.add_all([mod.Hostel(id=i, name=f'Hostel {i}', owner_name='Owner', owner_phone='+910000000000',
+                                           owner_email='owner@example.com', total_beds=100000)
+                                for i in range(1, hostels + 1)])
+        mod.db.session.commit()
+    return mod
+
+
+def payload(i, hostels):
+    hostel_id = random.randint(1, hostels)
+    return {'hostel_id': hostel_id, 'hostel_name': f'Hostel {hostel_id}', 'checkin_date': f'2026-07-{random.randint(1, 28):02d}',
+            'num_beds': random.randint(1, 3), 'user_name': f'Guest {i}', 'user_email': f'guest{i}@agency.example',
+            'user_phone': '9999999999'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-row vs batch booking ingestion")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=1000, help='Rows per batch request')
+    parser.add_argument('--hostels', type=int, default=20)
+    args = parser.parse_args()
+    rows = [payload(i, args.hostels) for i in range(args.rows)]
+
+    mod = fresh_app(args.hostels)
+    client = mod.app.test_client()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for row in rows:
+            assert client.post('/api/bookings', json=row).status_code == 201
+    single = args.rows / (time.perf_counter() - started)
+
+    mod = fresh_app(args.hostels)
+    client = mod.app.test_client()
+    started = time.perf_counter()
+    for start in range(0, args.rows, args.batch):
+        result = client.post('/api/bookings/batch', json=rows[start:start + args.batch]).get_json()
+        assert result['created'] == len(rows[start:start + args.batch]), result
+    batch = args.rows / (time.perf_counter() - started)
+
+    print(f'{args.rows} bookings across {args.hostels} hostels')
+    print(f'POST /api/bookings        {single:9.0f} rows/s')
+    print(f'POST /api/bookings/batch  {batch:9.0f} rows/s  ({batch / single:.1f}x, {args.batch} rows per request)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# HostelBookingApp/bench/common.py
+# Helpers shared by the benchmark and stress scripts in this folder.
+
+import datetime
+import importlib.util
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Both apps live in a file called app.py, so they are loaded by path under distinct names
+APPS = {
+    'site': os.path.join(ROOT, 'app.py'),       # Server-rendered site
+    'api': os.path.join(ROOT, '123', 'app.py'),  # JSON backend
+}
+
+
+def load_app(name, database_url):
+    """Import one of the apps against database_url and create its tables."""
+    os.environ['DATABASE_URL'] = database_url
+    # Scripts drive the app from one address far faster than any guest, so admission
+    # control is off unless a script sets these itself
+    os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+    os.environ.setdefault('WRITE_CONCURRENCY', '0')
+    spec = importlib.util.spec_from_file_location(f'hostel_{name}_app', APPS[name])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    with module.app.app_context():
+        module.db.create_all()
+    return module
+
+
+# Synthetic data, loosely modelled on the seed hostels in app.py
+AREAS = ['Kandlakoya', 'Medchal', 'Kompally', 'Gundlapochampally', 'Dulapally', 'Suchitra', 'Bowenpally',
+         'Secunderabad', 'Ameerpet', 'Kukatpally', 'Miyapur', 'Gachibowli', 'Madhapur', 'Kondapur']
+FEATURES = [('wifi', 'High-Speed Wi-Fi'), ('fan', 'Air Conditioning'), ('lock', 'Personal Lockers'),
+            ('shower-head', 'Hot Showers 24/7'), ('tv', 'Common TV Area'), ('coffee', '24/7 Coffee Bar'),
+            ('washing-machine', 'Laundry Service'), ('gym', 'GYM service'), ('book', 'Extensive Library'),
+            ('lamp-desk', 'Study Desks'), ('air-vent', 'Central AC')]
+DISHES = ['Pulihora', 'Idli', 'Vada', 'Dosa', 'Bonda', 'Chapathi', 'Oats', 'Paratha', 'Paneer Butter Masala',
+          'Chicken Curry', 'Egg Curry', 'Veg Thali', 'Dal', 'Curd Rice', 'Biryani', 'Upma', 'Poori']
+REVIEW_WORDS = ['clean', 'friendly', 'quiet', 'spacious', 'safe', 'noisy', 'tasty', 'cosy', 'affordable',
+                'central', 'helpful', 'modern', 'bright', 'crowded', 'peaceful', 'homely']
+
+
+def hostel_row(i):
+    area = random.choice(AREAS)
+    return dict(
+        id=i, name=f"{random.choice(['Sai', 'Sri', 'Lakshmi', 'Green', 'Royal', 'Comfort', 'Elite'])} "
+                   f"{random.choice(['Residency', 'Hostel', 'PG', 'Co-Living', 'Stay'])} {i}",
+        address=f'{area}, Hyderabad', price=random.randint(40, 95) * 100, rating=round(random.uniform(3, 5), 1),
+        owner_name='Owner', owner_phone='+910000000000', owner_email='owner@example.com',
+        features_json=json.dumps([{'icon': icon, 'text': text} for icon, text in random.sample(FEATURES, 5)]),
+        menu_json=json.dumps({meal: ', '.join(random.sample(DISHES, 4)) for meal in ('breakfast', 'lunch', 'dinner')}),
+        reviews_json=json.dumps([{'name': 'Guest', 'rating': 4, 'text': ' '.join(random.sample(REVIEW_WORDS, 5))}
+                                 for _ in range(3)]))
+
+
+def booking_row(i, hostels):
+    hostel_id = random.randint(1, hostels)
+    return dict(
+        id=i, hostel_id=hostel_id, hostel_name=f'Hostel {hostel_id}',
+        checkin_date=datetime.date(2026, 1, 1) + datetime.timedelta(days=random.randint(0, 364)),
+        num_beds=random.randint(1, 3), user_name=f'Guest {i}', user_email=f'guest{i}@example.com',
+        user_phone='9999999999',
+        timestamp=datetime.datetime(2025, 1, 1) + datetime.timedelta(seconds=random.randint(0, 365 * 86400)))
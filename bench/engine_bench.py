@@ -0,0 +1,74 @@
+# HostelBookingApp/bench/engine_bench.py
+# Mixed read/write throughput of the JSON API with SQLite's defaults (SQLITE_TUNING=0)
+# and with the tuned engine layer (WAL, pragmas, separate read pool).
+#
+#   python bench/engine_bench.py --readers 8 --writers 4 --seconds 10
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from common import load_app
+
+
+def run(tuning, args):
+    os.environ['SQLITE_TUNING'] = '1' if tuning else '0'
+    mod = load_app('api', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='engine-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.add_all([mod.Hostel(id=i, name=f'Hostel {i}', owner_name='Owner', owner_phone='+910000000000',
+                                           owner_email='owner@example.com', total_beds=10 ** 6) for i in range(1, 11)])
+        mod.db.session.commit()
+    # Some history for the readers to page through
+    mod.app.test_client().post('/api/bookings/batch', json=[
+        {'hostel_id': i % 10 + 1, 'hostel_name': 'Hostel', 'checkin_date': f'2026-06-{i % 28 + 1:02d}', 'num_beds': 1,
+         'user_name': 'Guest', 'user_email': f'guest{i}@example.com', 'user_phone': '9999999999'} for i in range(5000)])
+
+    counts = Counter()
+    stop = time.perf_counter() + args.seconds
+
+    def reader():
+        client = mod.app.test_client()
+        while time.perf_counter() < stop:
+            status = client.get('/api/bookings?limit=50&hostel_id=3').status_code
+            counts['reads' if status == 200 else 'read errors'] += 1
+
+    def writer(n):
+        client = mod.app.test_client()
+        i = 0
+        while time.perf_counter() < stop:
+            i += 1
+            status = client.post('/api/bookings', json={
+                'hostel_id': i % 10 + 1, 'hostel_name': 'Hostel', 'checkin_date': '2026-07-01', 'num_beds': 1,
+                'user_name': 'Guest', 'user_email': f'w{n}-{i}@example.com', 'user_phone': '9999999999'}).status_code
+            counts['writes' if status == 201 else 'write errors'] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {key: value / args.seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite engine tuning benchmark")
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s each')
+    for label, tuning in (('defaults', False), ('tuned', True)):
+        result = run(tuning, args)
+        print(f'{label:9} ' + '  '.join(f'{key} {value:7.1f}/s' for key, value in sorted(result.items())))
+
+
+if __name__ == '__main__':
+    main()
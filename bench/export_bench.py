@@ -0,0 +1,70 @@
+# HostelBookingApp/bench/export_bench.py
+# Loads N synthetic bookings for one hostel, serves the JSON API with Werkzeug and downloads
+# the owner export as CSV and NDJSON over a real socket, reporting time to first byte, total
+# time, throughput and how much the process's peak memory grew while streaming. With the
+# default SQLite tuning the first export also maps up to mmap_size of the database file
+# into memory, which shows up in RSS; SQLITE_TUNING=0 isolates the Python side.
+#
+#   python bench/export_bench.py --bookings 2000000
+
+import argparse
+import http.client
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from common import booking_row, hostel_row, load_app
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def download(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    conn.request('GET', path)
+    response = conn.getresponse()
+    first = response.read(1)
+    first_byte = time.perf_counter() - started
+    size, lines = len(first), first.count(b'\n')
+    while chunk := response.read(1 << 16):
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    return response.status, first_byte, time.perf_counter() - started, size, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming booking export: latency and memory")
+    parser.add_argument('--bookings', type=int, default=2000000)
+    args = parser.parse_args()
+
+    mod = load_app('api', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='export-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.execute(mod.db.insert(mod.Hostel), [hostel_row(1)])
+        for start in range(1, args.bookings + 1, 50000):
+            rows = [booking_row(i, 1) for i in range(start, min(start + 50000, args.bookings + 1))]
+            mod.db.session.execute(mod.db.insert(mod.Booking), rows)
+        mod.db.session.commit()
+        mod.db.session.execute(mod.db.text('ANALYZE'))
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, mod.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f'{args.bookings} bookings for one hostel; peak RSS after loading {peak_rss_mb():.0f} MB')
+    for label, query in [('csv, whole table', 'format=csv'), ('ndjson, whole table', 'format=ndjson'),
+                         ('csv, one month', 'format=csv&from=2026-07-01&to=2026-07-31')]:
+        before = peak_rss_mb()
+        status, first_byte, total, size, lines = download(server.server_port, f'/api/hostels/1/bookings/export?{query}')
+        print(f'{label:20} {status}  first byte {first_byte * 1000:6.1f} ms  total {total:6.2f} s  '
+              f'{lines / total:8.0f} rows/s  {size / 2 ** 20:7.1f} MiB  peak RSS +{peak_rss_mb() - before:.0f} MB')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# HostelBookingApp/bench/generate_data.py
+# Fills a bookings database with N synthetic hostels and M bookings for scale testing.
+# Popularity is skewed (a few hostels take most bookings), check-ins cluster around the
+# start of the month and a few weeks after booking, and hostels carry full image,
+# feature, menu, timing and review payloads. Rows go in through chunked executemany on
+# one raw connection, with durability relaxed and the booking indexes and triggers
+# dropped for the load, then rebuilt once: occupancy and bed inventory are recounted
+# with single INSERT ... SELECT statements, and no live events are emitted for history.
+#
+#   python bench/generate_data.py --app site --database sqlite:///bookings.db --hostels 1000 --bookings 1000000
+
+import argparse
+import datetime
+import itertools
+import json
+import random
+import sys
+import time
+
+from common import AREAS, DISHES, FEATURES, REVIEW_WORDS, load_app
+
+CHUNK_SIZE = 50000
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Sai', 'Arjun', 'Rohan', 'Karthik', 'Rahul', 'Vikram', 'Nikhil',
+               'Ananya', 'Diya', 'Sneha', 'Priya', 'Kavya', 'Anjali', 'Shruthi', 'Meera', 'Lakshmi', 'Divya']
+LAST_NAMES = ['Reddy', 'Rao', 'Sharma', 'Naidu', 'Kumar', 'Singh', 'Varma', 'Goud', 'Chowdary', 'Patel',
+              'Iyer', 'Nair', 'Gupta', 'Yadav', 'Shetty']
+NAME_PARTS = (['Sai', 'Sri', 'Lakshmi', 'Green', 'Royal', 'Comfort', 'Elite', 'Sunrise', 'Ganesh', 'Balaji'],
+              ['Residency', 'Hostel', 'PG', 'Co-Living', 'Stay', 'Boys Hostel', 'Girls Hostel', 'Nest'])
+TIMINGS = [('Main Gate Closing', ['10:00 PM', '10:30 PM', '11:00 PM', '11:30 PM']),
+           ('Breakfast', ['7:00 AM - 9:00 AM', '7:30 AM - 9:30 AM']),
+           ('Lunch', ['12:30 PM - 2:30 PM', '1:00 PM - 3:00 PM']),
+           ('Dinner', ['7:30 PM - 9:30 PM', '8:00 PM - 10:00 PM'])]
+
+
+def person(rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return first, last, f'{first} {last}'
+
+
+def hostel_row(rng, hostel_id):
+    owner = person(rng)
+    reviews = []
+    for _ in range(int(rng.paretovariate(1.2)) * 3): # Most hostels have a few reviews, some have many
+        first, last, name = person(rng)
+        reviews.append({'name': name, 'rating': rng.choices([5, 4, 3, 2, 1], [40, 35, 15, 6, 4])[0],
+                        'text': ' '.join(rng.sample(REVIEW_WORDS, rng.randint(4, 10))).capitalize() + '.',
+                        'avatar': first[0] + last[0]})
+    rating = round(sum(review['rating'] for review in reviews) / len(reviews), 1) if reviews else None
+    return {
+        'id': hostel_id,
+        'name': f'{rng.choice(NAME_PARTS[0])} {rng.choice(NAME_PARTS[1])} {hostel_id}',
+        'address': f'{rng.choice(AREAS)}, Hyderabad {rng.randint(500001, 501510)}',
+        'price': rng.randint(30, 120) * 100,
+        'rating': rating,
+        'owner_name': f'Mr. {owner[2]}',
+        'owner_phone': f'+91{rng.randint(6, 9)}{rng.randrange(10 ** 9):09d}',
+        'owner_email': f'{owner[0].lower()}.{owner[1].lower()}{hostel_id}@example.com',
+        'total_beds': rng.choice([20, 30, 40, 50, 60, 80, 100, 150, 200]),
+        'images_json': json.dumps([f'/static/photos/{rng.randrange(10 ** 9)}.jpg' for _ in range(rng.randint(3, 8))]),
+        'features_json': json.dumps([{'icon': icon, 'text': text}
+                                     for icon, text in rng.sample(FEATURES, rng.randint(3, 9))]),
+        'menu_json': json.dumps({meal: ', '.join(rng.sample(DISHES, rng.randint(3, 6)))
+                                 for meal in ('breakfast', 'lunch', 'dinner')}),
+        'timings_json': json.dumps([{'key': key, 'value': rng.choice(values)} for key, values in TIMINGS]),
+        'reviews_json': json.dumps(reviews),
+    }
+
+
+class DayStrings(dict):
+    """Date ordinal -> (ISO date, ordinal of the next 1st of a month), computed once per day."""
+
+    def __missing__(self, ordinal):
+        day = datetime.date.fromordinal(ordinal)
+        self[ordinal] = value = (day.isoformat(), (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1).toordinal())
+        return value
+
+
+def booking_rows(rng, first_id, count, hostels, today):
+    """Booking tuples in BOOKING_FIELDS order, with dates already in SQLAlchemy's storage format.
+
+    Everything that repeats (dates, times of day, names) is formatted once up front; per
+    row there is only arithmetic and a few random draws.
+    """
+    ids = [hostel_id for hostel_id, _ in hostels]
+    names = dict(hostels)
+    # Zipf-like popularity: the k-th most popular hostel gets weight 1 / k
+    popularity = list(itertools.accumulate(1 / rank for rank in range(1, len(ids) + 1)))
+    guests = [(f'{first} {last}', f'{first.lower()}.{last.lower()}') for first in FIRST_NAMES for last in LAST_NAMES]
+    times = [f'{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.000000' for second in range(86400)]
+    days = DayStrings()
+    today = today.toordinal()
+    random_ = rng.random
+    for booking_id, hostel_id, beds, (guest, email) in zip(
+            range(first_id, first_id + count), rng.choices(ids, cum_weights=popularity, k=count),
+            rng.choices((1, 2, 3, 4), (70, 20, 7, 3), k=count), rng.choices(guests, k=count)):
+        # Booked some time in the last year, for a stay a few weeks out; students favour the 1st
+        booked = today - 1 - int(random_() * 365)
+        checkin = booked + int(rng.expovariate(1 / 21))
+        if random_() < 0.4:
+            checkin = days[checkin][1]
+        yield (booking_id, hostel_id, names[hostel_id], days[checkin][0], beds, guest,
+               f'{email}{booking_id}@example.com', f'{int(6e9 + random_() * 4e9)}',
+               f'{days[booked][0]} {times[int(random_() * 86400)]}')
+
+
+BOOKING_FIELDS = ('id', 'hostel_id', 'hostel_name', 'checkin_date', 'num_beds', 'user_name', 'user_email',
+                  'user_phone', 'timestamp')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic hostels and bookings")
+    parser.add_argument('--app', choices=['site', 'api'], default='site', help='Whose schema and triggers to use')
+    parser.add_argument('--database', default='sqlite:///bookings.db')
+    parser.add_argument('--hostels', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mod = load_app(args.app, args.database)
+    today = datetime.date.today()
+    started = time.perf_counter()
+    with mod.app.app_context(), mod.db.engine.connect() as conn:
+        # Nothing is lost but this load if the machine dies mid-way
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+        conn.exec_driver_sql('PRAGMA cache_size = -262144')
+        conn.exec_driver_sql('PRAGMA temp_store = MEMORY')
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        # Indexes are cheaper built once from sorted data than updated row by row, and the
+        # per-row triggers are replaced by the recounts below
+        deferred = conn.exec_driver_sql(
+            "SELECT type, name, sql FROM sqlite_master WHERE tbl_name IN ('booking', 'bed_inventory') "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL").all()
+        for kind, name, _ in deferred:
+            conn.exec_driver_sql(f'DROP {kind.upper()} {name}')
+
+        first_hostel = conn.exec_driver_sql('SELECT COALESCE(MAX(id), 0) + 1 FROM hostel').scalar()
+        columns = [row[1] for row in conn.exec_driver_sql('PRAGMA table_info(hostel)')] # 123 has fewer
+        if args.hostels:
+            conn.exec_driver_sql(f"INSERT INTO hostel ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                                 [tuple(hostel[column] for column in columns) for hostel in
+                                  (hostel_row(rng, i) for i in range(first_hostel, first_hostel + args.hostels))])
+        hostels = conn.exec_driver_sql('SELECT id, name FROM hostel ORDER BY id').all()
+        if args.bookings and not hostels:
+            sys.exit('No hostels to book; pass --hostels')
+        rng.shuffle(hostels) # Popularity rank is independent of id
+        hostels_loaded = time.perf_counter()
+
+        first_booking = conn.exec_driver_sql('SELECT COALESCE(MAX(id), 0) + 1 FROM booking').scalar()
+        rows = booking_rows(rng, first_booking, args.bookings, hostels, today)
+        insert = f"INSERT INTO booking ({', '.join(BOOKING_FIELDS)}) VALUES ({', '.join('?' * len(BOOKING_FIELDS))})"
+        while chunk := list(itertools.islice(rows, CHUNK_SIZE)):
+            conn.exec_driver_sql(insert, chunk)
+        bookings_loaded = time.perf_counter()
+
+        for kind, name, sql in deferred:
+            if kind == 'index':
+                conn.exec_driver_sql(sql)
+        # Popular hostels are big ones: grow each hostel to hold its busiest night
+        conn.exec_driver_sql(
+            "UPDATE hostel SET total_beds = peak FROM (SELECT hostel_id, MAX(beds) AS peak FROM "
+            "(SELECT hostel_id, SUM(num_beds) AS beds FROM booking GROUP BY hostel_id, checkin_date) "
+            "GROUP BY hostel_id) AS busiest WHERE busiest.hostel_id = hostel.id AND peak > total_beds")
+        conn.exec_driver_sql(
+            "INSERT INTO bed_inventory (hostel_id, date, capacity, booked) "
+            "SELECT booking.hostel_id, checkin_date, hostel.total_beds, SUM(num_beds) "
+            "FROM booking JOIN hostel ON hostel.id = booking.hostel_id WHERE booking.id >= ? "
+            "GROUP BY booking.hostel_id, checkin_date "
+            "ON CONFLICT (hostel_id, date) DO UPDATE SET booked = booked + excluded.booked, "
+            "capacity = MAX(capacity, booked + excluded.booked)", (first_booking,))
+        for kind, name, sql in deferred:
+            if kind == 'trigger':
+                conn.exec_driver_sql(sql)
+        for statement in mod.OCCUPANCY_REBUILD:
+            conn.exec_driver_sql(statement)
+        conn.commit()
+        conn.exec_driver_sql('ANALYZE')
+        conn.commit()
+    finished = time.perf_counter()
+
+    print(f'{args.hostels} hostels in {hostels_loaded - started:.1f} s, '
+          f'{args.bookings} bookings in {bookings_loaded - hostels_loaded:.1f} s '
+          f'({args.bookings / (bookings_loaded - hostels_loaded):.0f} rows/s), '
+          f'indexes and rollups in {finished - bookings_loaded:.1f} s; {finished - started:.1f} s in total')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# HostelBookingApp/bench/idempotency_race.py
+# Races many concurrent retries of the same booking: every key (API Idempotency-Key header,
+# or the site's idempotency_token form field) is posted by several threads at once. Checks
+# that each key made exactly one booking with one set of notifications, and that every
+# response for a key points at that booking.
+#
+#   python bench/idempotency_race.py --app api --keys 10 --requests 400 --workers 64
+#   python bench/idempotency_race.py --app site --keys 5 --requests 100
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent retries under one idempotency key")
+    parser.add_argument('--app', choices=['api', 'site'], default='api')
+    parser.add_argument('--keys', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=64)
+    args = parser.parse_args()
+
+    mod = load_app(args.app, 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='idempotency-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.add(mod.Hostel(id=1, name='Retry Hostel', owner_name='Owner', owner_phone='+910000000000',
+                                      owner_email='owner@example.com', total_beds=10 ** 6))
+        mod.db.session.commit()
+
+    def book(i):
+        key = f'key-{i % args.keys}'
+        fields = {'user_name': f'user{i % args.keys}', 'user_email': f'user{i % args.keys}@example.com',
+                  'user_phone': '9999999999', 'checkin_date': '2026-07-01', 'num_beds': 1}
+        client = mod.app.test_client()
+        if args.app == 'api':
+            response = client.post('/api/bookings', headers={'Idempotency-Key': key},
+                                   json={'hostel_id': 1, 'hostel_name': 'Retry Hostel', **fields})
+            booking_id = response.get_json().get('booking_id') if response.status_code == 201 else None
+        else:
+            response = client.post('/book/1', data={**fields, 'num_beds': '1', 'idempotency_token': key})
+            # A booking, first or replayed, redirects to /booking_confirmation/<id>
+            location = response.headers.get('Location', '')
+            booking_id = int(location.rsplit('/', 1)[1]) if response.status_code == 302 and location[-1:].isdigit() else None
+        return key, response.status_code, booking_id
+
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(book, range(args.requests)))
+
+    answers = defaultdict(set)
+    for key, _, booking_id in results:
+        answers[key].add(booking_id)
+    with mod.app.app_context():
+        bookings = mod.db.session.scalar(mod.db.select(mod.db.func.count()).select_from(mod.Booking))
+        notifications = Counter(mod.db.session.scalars(mod.db.select(mod.Notification.booking_id)))
+
+    print(f'{args.requests} posts over {args.keys} keys from {args.workers} workers: '
+          f'{dict(Counter(status for _, status, _ in results))}')
+    print(f'{bookings} bookings, notifications per booking: {dict(Counter(notifications.values()))}')
+    split = {key: ids for key, ids in answers.items() if len(ids) != 1 or None in ids}
+    if bookings != args.keys or split or len(set(notifications.values())) != 1 or len(notifications) != bookings:
+        print(f'FAIL: expected one booking per key; keys answered inconsistently: {split}')
+        return 1
+    print('OK: one booking and one set of notifications per key')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# HostelBookingApp/bench/image_bench.py
+# Generates N synthetic camera-sized photos, runs the image derivative pipeline over them
+# and reports the build time, the bytes saved per size and format, and how long an
+# incremental re-run takes after touching one photo and editing another. Finishes by
+# fetching a derived file to check its cache headers.
+#
+#   python bench/image_bench.py --photos 40 --workers 4
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from common import load_app
+
+
+def synthetic_photo(path, seed, size=(3000, 2000)):
+    """A blurred scatter of shapes: compresses roughly like a real photo, unlike noise or flat colour."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(300):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randrange(50, 600), y + rng.randrange(50, 600)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    image.filter(ImageFilter.GaussianBlur(4)).save(path, quality=90)
+
+
+def run(mod, label, **kwargs):
+    started = time.perf_counter()
+    built, skipped, failed = mod.build_image_derivatives(**kwargs)
+    print(f'{label:28} {time.perf_counter() - started:7.2f} s  built {built}, unchanged {skipped}, failed {failed}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image derivative build and incremental re-run")
+    parser.add_argument('--photos', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='images-')
+    mod = load_app('site', 'sqlite:///' + os.path.join(folder, 'bookings.db'))
+    # Point the pipeline at a scratch static folder instead of the real one
+    mod.app.static_folder = os.path.join(folder, 'static')
+    mod.PHOTOS_DIR = os.path.join(mod.app.static_folder, 'photos')
+    mod.DERIVED_DIR = os.path.join(mod.app.static_folder, 'derived')
+    mod.IMAGE_MANIFEST = os.path.join(mod.DERIVED_DIR, 'manifest.json')
+    os.makedirs(mod.PHOTOS_DIR)
+    for i in range(args.photos):
+        synthetic_photo(os.path.join(mod.PHOTOS_DIR, f'photo{i}.jpg'), i)
+    source_bytes = sum(os.path.getsize(os.path.join(mod.PHOTOS_DIR, name)) for name in os.listdir(mod.PHOTOS_DIR))
+    print(f'{args.photos} photos, 3000x2000, {source_bytes / args.photos / 1024:.0f} KiB each; {args.workers} workers')
+
+    with mod.app.app_context():
+        run(mod, 'first build, 1 worker', workers=1)
+        run(mod, f'forced build, {args.workers} workers', workers=args.workers, force=True)
+        run(mod, 'nothing changed', workers=args.workers)
+        os.utime(os.path.join(mod.PHOTOS_DIR, 'photo0.jpg')) # Touched: hashed, then skipped
+        synthetic_photo(os.path.join(mod.PHOTOS_DIR, 'photo1.jpg'), 10 ** 6) # Really changed
+        run(mod, 'one touched, one edited', workers=args.workers, prune=True)
+
+    manifest = mod.image_manifest()
+    for size in mod.app.config['IMAGE_SIZES']:
+        for fmt in mod.app.config['IMAGE_FORMATS']:
+            total = sum(os.path.getsize(os.path.join(mod.DERIVED_DIR, entry['variants'][size][fmt]))
+                        for entry in manifest.values())
+            print(f'{size:6} {fmt:5} {total / len(manifest) / 1024:7.1f} KiB each '
+                  f'({total / source_bytes:.1%} of the originals)')
+
+    url = mod.image_variant('/static/photos/photo2.jpg', 'thumb')['webp']
+    response = mod.app.test_client().get(url)
+    print(f'GET {url}: {response.status_code}, Cache-Control: {response.headers["Cache-Control"]}')
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
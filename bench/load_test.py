@@ -0,0 +1,296 @@
+# HostelBookingApp/bench/load_test.py
+# Drives every route of one app against a synthetic dataset and reports p50/p95/p99 latency,
+# requests/sec and peak RSS per route. Results can be saved as JSON and compared with an
+# earlier run to catch performance regressions.
+#
+#   python bench/load_test.py --app site --hostels 200 --bookings 50000 --output site-before.json
+#   python bench/load_test.py --app site --hostels 200 --bookings 50000 --compare site-before.json
+#   python bench/load_test.py --app api --server --concurrency 16
+
+import argparse
+import contextlib
+import datetime
+import http.client
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from jinja2 import DictLoader
+
+from common import ROOT, booking_row, hostel_row, load_app
+
+# Stand-ins for the site's templates, used only when the checkout has no templates folder.
+# They touch the same fields the real pages do, so the ORM and JSON decoding work is still measured.
+PLACEHOLDER_TEMPLATES = {
+    'index.html': "{% for h in hostels %}<a href='/hostel/{{ h.id }}'>{{ h.name }}</a> {{ h.address }} {{ h.price }} "
+                  "{{ h.rating }} {{ h.get_images()|length }} {{ h.get_features()|length }}{% endfor %}",
+    'hostel_detail.html': "{{ hostel.name }} {{ hostel.get_images() }} {{ hostel.get_features() }} {{ hostel.get_menu() }} "
+                          "{{ hostel.get_timings() }} {{ hostel.get_reviews() }}",
+    'booking_form.html': "{{ get_flashed_messages() }} {{ hostel.name }} {{ current_date }} "
+                         "<input type='hidden' name='idempotency_token' value='{{ idempotency_token }}'>",
+    'booking_confirmation.html': "{{ booking.user_name }} {{ hostel.name }} {{ checkin_date_formatted }} {{ Maps_url }} "
+                                 "{{ whatsapp_url }} {{ email_url }}",
+}
+
+_sequence = itertools.count(1) # Keeps generated emails unique across threads
+_dumps = json.dumps # ServerTransport.request() takes a `json` keyword like the test client
+
+
+def booking_payload(args):
+    i = next(_sequence)
+    hostel_id = random.randint(1, args.hostels)
+    return {'hostel_id': hostel_id, 'hostel_name': f'Hostel {hostel_id}',
+            'checkin_date': f'2026-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}', 'num_beds': 1,
+            'user_name': f'Load {i}', 'user_email': f'load{i}@example.com', 'user_phone': '9999999999'}
+
+
+def site_scenarios(args):
+    """(route, request factory, expected status) for every page of the server-rendered app."""
+    hostel = lambda: random.randint(1, args.hostels)
+    booking = lambda: random.randint(1, args.bookings)
+
+    def book_form():
+        fields = booking_payload(args)
+        return 'POST', f"/book/{fields['hostel_id']}", {'form': {key: str(value) for key, value in fields.items()}}
+
+    return [
+        ('index', lambda: ('GET', '/', {}), 200),
+        ('hostel_detail', lambda: ('GET', f'/hostel/{hostel()}', {}), 200),
+        ('search', lambda: ('GET', '/search?' + urlencode({'q': random.choice(['kompally', 'gym', 'biryani'])}), {}), 200),
+        ('search_api', lambda: ('GET', '/api/search?' + urlencode({'q': 'wifi', 'min_rating': 4}), {}), 200),
+        ('book_bed GET', lambda: ('GET', f'/book/{hostel()}', {}), 200),
+        ('book_bed POST', book_form, 302),
+        ('booking_confirmation', lambda: ('GET', f'/booking_confirmation/{booking()}', {}), 200),
+    ]
+
+
+def api_scenarios(args):
+    """(route, request factory, expected status) for every endpoint of the JSON API."""
+    hostel = lambda: random.randint(1, args.hostels)
+    return [
+        ('index', lambda: ('GET', '/', {}), 200),
+        ('get_hostels', lambda: ('GET', '/api/hostels', {}), 200),
+        ('get_bookings', lambda: ('GET', '/api/bookings?limit=100', {}), 200),
+        ('get_bookings filtered', lambda: ('GET', f'/api/bookings?hostel_id={hostel()}&from=2026-03-01&to=2026-03-31', {}), 200),
+        ('get_bookings ndjson', lambda: ('GET', f'/api/bookings?hostel_id={hostel()}&format=ndjson', {}), 200),
+        ('create_booking', lambda: ('POST', '/api/bookings', {'json': booking_payload(args)}), 201),
+        ('create_bookings_batch', lambda: ('POST', '/api/bookings/batch',
+                                           {'json': [booking_payload(args) for _ in range(50)]}), 200),
+    ]
+
+
+class ClientTransport:
+    """Calls the app in-process through Flask's test client (one client per thread)."""
+
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, form=None, json=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, data=form, json=json)
+        response.get_data() # Drain streamed bodies so their cost is included
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class ServerTransport:
+    """Serves the app with Werkzeug's threaded WSGI server and calls it over real HTTP."""
+
+    name = 'wsgi-server'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR) # No access log per request
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, form=None, json=None):
+        headers, body = {}, None
+        if form is not None:
+            headers['Content-Type'], body = 'application/x-www-form-urlencoded', urlencode(form)
+        elif json is not None:
+            headers['Content-Type'], body = 'application/json', _dumps(json)
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def seed(mod, args):
+    """Load args.hostels hostels and args.bookings bookings with bulk inserts."""
+    random.seed(args.seed)
+    with mod.app.app_context():
+        hostels = [dict(hostel_row(i), total_beds=10 ** 6) for i in range(1, args.hostels + 1)]
+        mod.db.session.execute(mod.db.insert(mod.Hostel), hostels)
+        for start in range(1, args.bookings + 1, 10000):
+            rows = [booking_row(i, args.hostels) for i in range(start, min(start + 10000, args.bookings + 1))]
+            mod.db.session.execute(mod.db.insert(mod.Booking), rows)
+        mod.db.session.commit()
+        mod.db.session.execute(mod.db.text('ANALYZE'))
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_route(transport, factory, expected, args):
+    def call(_):
+        method, path, body = factory()
+        started = time.perf_counter()
+        try:
+            status = transport.request(method, path, **body)
+        except Exception:
+            status = None
+        return (time.perf_counter() - started) * 1000, status == expected
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(call, range(args.warmup)))
+        started = time.perf_counter()
+        results = list(pool.map(call, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'rps': round(len(results) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'peak_rss_mb': peak_rss_mb(), # Process-wide high-water mark once this route has run
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print per-route changes against baseline; return the routes that regressed."""
+    regressions = []
+    for key in ('app', 'transport', 'templates', 'hostels', 'bookings', 'concurrency'):
+        if results['meta'][key] != baseline['meta'].get(key):
+            print(f"warning: {key} differs from the baseline ({baseline['meta'].get(key)} vs {results['meta'][key]})")
+    print(f"\nagainst {baseline['meta'].get('revision')} ({baseline['meta'].get('started')}), tolerance {tolerance:.0%}")
+    for route, now in results['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        p95 = now['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+        rps = now['rps'] / before['rps'] - 1 if before['rps'] else 0
+        slower = p95 > tolerance or rps < -tolerance
+        if slower:
+            regressions.append(route)
+        print(f"{route:24} p95 {before['p95_ms']:8.2f} -> {now['p95_ms']:8.2f} ms ({p95:+.0%})  "
+              f"rps {before['rps']:8.1f} -> {now['rps']:8.1f} ({rps:+.0%}){'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-route load test for either app")
+    parser.add_argument('--app', choices=['site', 'api'], default='api')
+    parser.add_argument('--hostels', type=int, default=100)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=500, help='Measured requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--server', action='store_true', help='Go through a real WSGI server instead of the test client')
+    parser.add_argument('--routes', nargs='*', help='Only run these routes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95/rps change before flagging a regression')
+    args = parser.parse_args()
+
+    mod = load_app(args.app, 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='load-'), 'bookings.db'))
+    templates = 'app'
+    if args.app == 'site' and not os.path.isdir(os.path.join(mod.app.root_path, mod.app.template_folder)):
+        mod.app.jinja_env.loader = DictLoader(PLACEHOLDER_TEMPLATES)
+        templates = 'placeholder'
+    seed(mod, args)
+
+    results = {
+        'meta': {
+            'app': args.app, 'revision': git_revision(), 'started': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'templates': templates,
+            'transport': ServerTransport.name if args.server else ClientTransport.name,
+            'hostels': args.hostels, 'bookings': args.bookings, 'requests': args.requests,
+            'concurrency': args.concurrency, 'seed': args.seed,
+        },
+        'routes': {},
+    }
+    transport = ServerTransport(mod.app) if args.server else ClientTransport(mod.app)
+    scenarios = site_scenarios(args) if args.app == 'site' else api_scenarios(args)
+
+    meta = results['meta']
+    print(f"{meta['app']} @ {meta['revision']} via {meta['transport']}: {args.hostels} hostels, {args.bookings} bookings, "
+          f"{args.requests} requests/route, concurrency {args.concurrency}")
+    try:
+        for route, factory, expected in scenarios:
+            if args.routes and route not in args.routes:
+                continue
+            # The apps print queued notifications; keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = run_route(transport, factory, expected, args)
+            results['routes'][route] = stats
+            print(f"{route:24} p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f} ms  "
+                  f"{stats['rps']:8.1f} req/s  {stats['errors']:4} errors  peak RSS {stats['peak_rss_mb']} MB")
+    finally:
+        transport.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'results written to {args.output}')
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(f"{len(regressions)} route(s) regressed: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# HostelBookingApp/bench/notify_latency.py
+# Measures booking POST latency while notifications go to a deliberately slow local SMTP
+# server, and how long the outbox worker takes to drain them. Needs aiosmtpd installed.
+#
+#   python bench/notify_latency.py --bookings 100 --smtp-delay 0.5
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from aiosmtpd.controller import Controller
+
+from common import load_app
+
+
+class SlowHandler:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking latency with a slow SMTP server")
+    parser.add_argument('--app', choices=['api', 'site'], default='api')
+    parser.add_argument('--bookings', type=int, default=100)
+    parser.add_argument('--smtp-delay', type=float, default=0.5, help='Seconds the SMTP server takes per message')
+    args = parser.parse_args()
+
+    handler = SlowHandler(args.smtp_delay)
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+    os.environ.update(SMTP_HOST='127.0.0.1', SMTP_PORT='8025')
+
+    mod = load_app(args.app, 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='notify-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.add(mod.Hostel(id=1, name='Bench Hostel', owner_name='Owner', owner_phone='+910000000000',
+                                      owner_email='owner@example.com', total_beds=args.bookings * 3))
+        mod.db.session.commit()
+    mod.notification_worker.poll_interval = 0.1
+    mod.notification_worker.start()
+
+    client = mod.app.test_client()
+    latencies = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.bookings):
+            t0 = time.perf_counter()
+            if args.app == 'api':
+                client.post('/api/bookings', json={
+                    'hostel_id': 1, 'hostel_name': 'Bench Hostel', 'checkin_date': '2026-07-01', 'num_beds': 1,
+                    'user_name': f'user{i}', 'user_email': f'user{i}@example.com', 'user_phone': '9999999999'})
+            else:
+                client.post('/book/1', data={
+                    'user_name': f'user{i}', 'user_email': f'user{i}@example.com', 'user_phone': '9999999999',
+                    'checkin_date': '2026-07-01', 'num_beds': '1'})
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    expected = args.bookings * 2
+    while handler.received < expected:
+        time.sleep(0.05)
+    drained = time.perf_counter() - started
+    mod.notification_worker.stop()
+    controller.stop()
+
+    latencies.sort()
+    print(f'{args.bookings} bookings, SMTP delay {args.smtp_delay}s per message')
+    print(f'POST latency: p50 {statistics.median(latencies):.1f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, max {latencies[-1]:.1f} ms')
+    print(f'All {expected} notifications delivered after {drained:.2f}s '
+          f'(serial delivery would take {expected * args.smtp_delay:.0f}s)')
+
+
+if __name__ == '__main__':
+    main()
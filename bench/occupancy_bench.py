@@ -0,0 +1,67 @@
+# HostelBookingApp/bench/occupancy_bench.py
+# Loads N synthetic bookings into the JSON API and compares the occupancy analytics endpoint,
+# which reads the occupancy_daily rollup, against aggregating the booking table directly.
+#
+#   python bench/occupancy_bench.py --bookings 1000000
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from common import booking_row, hostel_row, load_app
+
+# The same numbers computed straight from the booking table
+ON_THE_FLY = ("SELECT strftime('%Y-%m-01', checkin_date), COUNT(*), SUM(num_beds) FROM booking "
+              "WHERE hostel_id = :hostel_id AND checkin_date BETWEEN :start AND :end GROUP BY 1")
+
+CASES = [
+    ('next 30 days by day', 'period=day&from=2026-06-01&to=2026-06-30'),
+    ('quarter by week', 'period=week&from=2026-04-01&to=2026-06-30'),
+    ('year by month', 'period=month&from=2026-01-01&to=2026-12-31'),
+]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Occupancy rollup vs on-the-fly aggregation")
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--hostels', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    mod = load_app('api', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='occupancy-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.execute(mod.db.insert(mod.Hostel), [hostel_row(i) for i in range(1, args.hostels + 1)])
+        started = time.perf_counter()
+        for start in range(1, args.bookings + 1, 50000):
+            rows = [booking_row(i, args.hostels) for i in range(start, min(start + 50000, args.bookings + 1))]
+            mod.db.session.execute(mod.db.insert(mod.Booking), rows)
+        mod.db.session.commit()
+        loaded = time.perf_counter() - started
+        mod.db.session.execute(mod.db.text('ANALYZE'))
+        rollup_rows = mod.db.session.scalar(mod.db.select(mod.db.func.count()).select_from(mod.OccupancyDaily))
+
+    print(f'{args.bookings} bookings ({args.bookings / loaded:.0f} rows/s with the rollup triggers), '
+          f'{rollup_rows} rollup rows')
+    client = mod.app.test_client()
+    for label, query in CASES:
+        rollup = timed(lambda: client.get(f'/api/hostels/3/occupancy?{query}'), args.repeat)
+        print(f'{label:22} rollup {rollup:8.2f} ms')
+    with mod.app.app_context():
+        direct = timed(lambda: mod.db.session.execute(mod.db.text(ON_THE_FLY), {
+            'hostel_id': 3, 'start': '2026-01-01', 'end': '2026-12-31'}).all(), args.repeat)
+    print(f'{"year by month":22} direct {direct:8.2f} ms  (GROUP BY over booking)')
+
+
+if __name__ == '__main__':
+    main()
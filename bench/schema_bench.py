@@ -0,0 +1,100 @@
+# HostelBookingApp/bench/schema_bench.py
+# Builds a large bookings.db with the original schema (VARCHAR check-in dates, no indexes),
+# times the app's hot booking queries, runs the in-place upgrade and times them again.
+#
+#   python bench/schema_bench.py --app api --bookings 500000
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from common import load_app
+
+# The booking table as the first release of both apps created it
+ORIGINAL_SCHEMA = """
+CREATE TABLE hostel (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, address VARCHAR(255), price FLOAT, rating FLOAT,
+    owner_name VARCHAR(100) NOT NULL, owner_phone VARCHAR(20) NOT NULL, owner_email VARCHAR(100) NOT NULL,
+    images_json TEXT, features_json TEXT, menu_json TEXT, timings_json TEXT, reviews_json TEXT,
+    PRIMARY KEY (id)
+);
+CREATE TABLE booking (
+    id INTEGER NOT NULL, hostel_id INTEGER NOT NULL, hostel_name VARCHAR(100) NOT NULL,
+    checkin_date VARCHAR(10) NOT NULL, num_beds INTEGER NOT NULL, user_name VARCHAR(100),
+    user_email VARCHAR(100), user_phone VARCHAR(20), timestamp DATETIME, PRIMARY KEY (id)
+);
+"""
+
+QUERIES = {
+    'hostel date range': ("SELECT SUM(num_beds) FROM booking WHERE hostel_id = ? AND checkin_date BETWEEN ? AND ?",
+                          (7, '2026-03-01', '2026-03-31')),
+    'hostel night': ("SELECT SUM(num_beds) FROM booking WHERE hostel_id = ? AND checkin_date = ?",
+                     (7, '2026-03-15')),
+    'newest page': ("SELECT * FROM booking ORDER BY timestamp DESC, id DESC LIMIT 100", ()),
+    'keyset page': ("SELECT * FROM booking WHERE timestamp < ? ORDER BY timestamp DESC, id DESC LIMIT 100",
+                    ('2026-01-01 00:00:00.000000',)),
+}
+
+
+def build(path, hostels, bookings):
+    conn = sqlite3.connect(path)
+    conn.executescript(ORIGINAL_SCHEMA)
+    conn.executemany("INSERT INTO hostel (id, name, owner_name, owner_phone, owner_email) VALUES (?, ?, 'Owner', '+910000000000', 'owner@example.com')",
+                     [(i, f'Hostel {i}') for i in range(1, hostels + 1)])
+    start = datetime.datetime(2025, 1, 1)
+    rows = ((random.randint(1, hostels), 'Hostel', (start + datetime.timedelta(days=random.randint(0, 540))).date().isoformat(),
+             random.randint(1, 3), 'User', 'user@example.com', '9999999999',
+             (start + datetime.timedelta(seconds=random.randint(0, 540 * 86400))).strftime('%Y-%m-%d %H:%M:%S.%f'))
+            for _ in range(bookings))
+    conn.executemany("INSERT INTO booking (hostel_id, hostel_name, checkin_date, num_beds, user_name, user_email, user_phone, timestamp) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def measure(path, repeat):
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = '; '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, params).fetchall()
+        results[name] = ((time.perf_counter() - started) / repeat * 1000, plan)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking schema before/after benchmark")
+    parser.add_argument('--app', choices=['api', 'site'], default='api')
+    parser.add_argument('--hostels', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='schema-'), 'bookings.db')
+    build(path, args.hostels, args.bookings)
+    before = measure(path, args.repeat)
+
+    mod = load_app(args.app, 'sqlite:///' + path)
+    started = time.perf_counter()
+    with mod.app.app_context():
+        mod.upgrade_schema()
+    migration = time.perf_counter() - started
+    after = measure(path, args.repeat)
+
+    print(f'{args.bookings} bookings across {args.hostels} hostels; upgrade took {migration:.2f}s\n')
+    for name in QUERIES:
+        (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+        print(f'{name:18} {before_ms:9.3f} ms -> {after_ms:8.3f} ms')
+        print(f'    before: {before_plan}')
+        print(f'    after:  {after_plan}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# HostelBookingApp/bench/search_bench.py
+# Loads N synthetic hostels into the server-rendered app and times search_hostels() for
+# typical searches (ranking plus all facet counts).
+#
+#   python bench/search_bench.py --hostels 30000
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from common import hostel_row, load_app
+
+QUERIES = [
+    {},
+    {'text': 'kompally'},
+    {'text': 'gym', 'min_rating': 4.5},
+    {'text': 'biryani peaceful'},
+    {'text': 'Sai Residency'},
+    {'icons': ['wifi', 'gym'], 'max_price': 6000},
+    {'text': 'madhapur library', 'min_price': 6000, 'max_price': 8000},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hostel search latency")
+    parser.add_argument('--hostels', type=int, default=30000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    mod = load_app('site', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='search-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.execute(mod.db.insert(mod.Hostel), [hostel_row(i) for i in range(1, args.hostels + 1)])
+        mod.db.session.commit()
+        mod.db.session.execute(mod.db.text('ANALYZE'))
+
+        print(f'{args.hostels} hostels')
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                _, total, _ = mod.search_hostels(**query)
+                timings.append((time.perf_counter() - started) * 1000)
+                mod.db.session.expunge_all()
+            print(f'{json.dumps(query):65} {total:6} matches  p50 {statistics.median(timings):6.1f} ms  max {max(timings):6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
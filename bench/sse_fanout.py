@@ -0,0 +1,117 @@
+# HostelBookingApp/bench/sse_fanout.py
+# Serves the JSON API with Werkzeug's threaded server, opens N idle /api/stream connections,
+# makes bookings and measures how long each event takes to reach every subscriber, plus the
+# SQL statements the feed ran. Then reconnects one client with Last-Event-ID to check resume.
+#
+#   python bench/sse_fanout.py --subscribers 500 --bookings 50
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import selectors
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from common import load_app
+
+
+def open_stream(port, path='/api/stream', last_event_id=None):
+    sock = socket.create_connection(('127.0.0.1', port))
+    headers = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n'
+    if last_event_id is not None:
+        headers += f'Last-Event-ID: {last_event_id}\r\n'
+    sock.sendall((headers + '\r\n').encode())
+    sock.setblocking(False)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE fan-out latency and database reads")
+    parser.add_argument('--subscribers', type=int, default=500)
+    parser.add_argument('--bookings', type=int, default=50)
+    args = parser.parse_args()
+
+    mod = load_app('api', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='sse-'), 'bookings.db'))
+    with mod.app.app_context():
+        mod.db.session.add(mod.Hostel(id=1, name='Live Hostel', owner_name='Owner', owner_phone='+910000000000',
+                                      owner_email='owner@example.com', total_beds=10 ** 6))
+        mod.db.session.commit()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, mod.app, threaded=True)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    selector = selectors.DefaultSelector()
+    received = {} # subscriber -> {booking id: arrival time}
+    for n in range(args.subscribers):
+        selector.register(open_stream(port), selectors.EVENT_READ, n)
+        received[n] = {}
+    stop = threading.Event()
+
+    def read_all():
+        buffers = {n: b'' for n in received}
+        while not stop.is_set():
+            for key, _ in selector.select(timeout=0.1):
+                try:
+                    chunk = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                buffers[key.data] += chunk
+                *messages, buffers[key.data] = buffers[key.data].split(b'\n\n')
+                for message in messages:
+                    if b'event: booking' in message:
+                        booking_id = int(message.split(b'"id":')[1].split(b',')[0])
+                        received[key.data].setdefault(booking_id, time.perf_counter())
+
+    reader = threading.Thread(target=read_all, daemon=True)
+    reader.start()
+    time.sleep(2) # Let every connection reach the server
+    print(f'{mod.live_feed.subscribers} subscribers connected')
+
+    queries_before = mod.query_count._values.get((), 0)
+    client = mod.app.test_client()
+    sent = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.bookings):
+            started = time.perf_counter()
+            booking_id = client.post('/api/bookings', json={
+                'hostel_id': 1, 'hostel_name': 'Live Hostel', 'checkin_date': '2026-07-01', 'num_beds': 1,
+                'user_name': 'Guest', 'user_email': f'guest{i}@example.com', 'user_phone': '9999999999'}).get_json()['booking_id']
+            sent[booking_id] = started
+            time.sleep(0.05)
+    time.sleep(2)
+    stop.set()
+    reader.join()
+    feed_queries = mod.query_count._values.get((), 0) - queries_before
+
+    delays = sorted((arrivals[booking_id] - sent[booking_id]) * 1000
+                    for arrivals in received.values() for booking_id in sent if booking_id in arrivals)
+    missing = args.subscribers * args.bookings - len(delays)
+    print(f'{args.bookings} bookings x {args.subscribers} subscribers: {len(delays)} deliveries, {missing} missing')
+    print(f'POST to event received: p50 {statistics.median(delays):.1f} ms  '
+          f'p99 {delays[int(len(delays) * 0.99) - 1]:.1f} ms  max {delays[-1]:.1f} ms')
+    print(f'{feed_queries} SQL statements in total while streaming (bookings plus feed polls)')
+
+    # Resume: ask for everything after the first booking's events
+    first_event = mod.live_feed.events[0][0]
+    sock = open_stream(port, last_event_id=first_event)
+    sock.setblocking(True)
+    sock.settimeout(2)
+    data = b''
+    with contextlib.suppress(socket.timeout):
+        while data.count(b'event: booking') < args.bookings - 1:
+            data += sock.recv(65536)
+    print(f'resume from Last-Event-ID {first_event}: {data.count(b"event: booking")} booking events replayed')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# HostelBookingApp/bench/stress_booking.py
+# Fires thousands of concurrent bookings at one hostel and date, then checks that the
+# bed inventory was never oversold.
+#
+#   python bench/stress_booking.py --app api --requests 5000 --workers 64 --beds 500
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from common import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent booking stress test")
+    parser.add_argument('--app', choices=['api', 'site'], default='api')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--beds', type=int, default=500, help='Capacity of the hostel under test')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='stress-')
+    mod = load_app(args.app, 'sqlite:///' + os.path.join(tmp, 'stress.db'))
+    with mod.app.app_context():
+        mod.db.session.add(mod.Hostel(id=1, name='Stress Hostel', owner_name='Owner', owner_phone='+910000000000',
+                                      owner_email='owner@example.com', total_beds=args.beds))
+        mod.db.session.commit()
+
+    checkin_date = '2026-07-01'
+
+    def book(i):
+        num_beds = random.randint(1, 3)
+        client = mod.app.test_client()
+        if args.app == 'api':
+            resp = client.post('/api/bookings', json={
+                'hostel_id': 1, 'hostel_name': 'Stress Hostel', 'checkin_date': checkin_date,
+                'num_beds': num_beds, 'user_name': f'user{i}', 'user_email': f'user{i}@example.com',
+                'user_phone': '9999999999'})
+            return 'booked' if resp.status_code == 201 else str(resp.status_code)
+        resp = client.post('/book/1', data={
+            'user_name': f'user{i}', 'user_email': f'user{i}@example.com', 'user_phone': '9999999999',
+            'checkin_date': checkin_date, 'num_beds': str(num_beds)})
+        # A successful booking redirects to the confirmation page; a sold-out date re-renders the form
+        if resp.status_code >= 500:
+            return str(resp.status_code)
+        return 'booked' if resp.status_code == 302 else 'rejected'
+
+    started = time.perf_counter()
+    # The apps print a notification per booking; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        outcomes = Counter(pool.map(book, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    with mod.app.app_context():
+        booked_beds = mod.db.session.scalar(
+            mod.db.select(mod.db.func.coalesce(mod.db.func.sum(mod.Booking.num_beds), 0))
+            .where(mod.Booking.hostel_id == 1))
+        inventory = mod.db.session.scalars(mod.db.select(mod.BedInventory)).one()
+
+    print(f'{args.requests} requests from {args.workers} workers in {elapsed:.2f}s '
+          f'({args.requests / elapsed:.0f} req/s): {dict(outcomes)}')
+    print(f'Beds booked: {booked_beds}, inventory counter: {inventory.booked}, capacity: {inventory.capacity}')
+
+    server_errors = sum(count for outcome, count in outcomes.items() if outcome.startswith('5'))
+    if server_errors:
+        print(f'FAIL: {server_errors} requests failed with a server error')
+        return 1
+    if booked_beds > inventory.capacity or booked_beds != inventory.booked:
+        print('FAIL: bed inventory oversold or out of sync with bookings')
+        return 1
+    print('OK: no oversell')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())